@@ -0,0 +1,79 @@
+from django.conf import settings
+from graphql.error import GraphQLError
+from graphql.execution.values import get_argument_values, get_variable_values
+from graphql.type.definition import GraphQLList, get_named_type, get_nullable_type
+
+from .connections import collect_fields, page_length
+
+
+def max_depth():
+    return getattr(settings, 'GRAPHQL_MAX_DEPTH', 10)
+
+
+def max_cost():
+    return getattr(settings, 'GRAPHQL_MAX_COST', 10000)
+
+
+def list_size():
+    """
+    Returns the estimated length of lists without a 'first' argument, like the versions of an article
+    """
+    return getattr(settings, 'GRAPHQL_LIST_SIZE', 20)
+
+
+class QueryTooComplex(GraphQLError):
+    pass
+
+
+def analyze(schema, operation, fragments, variable_values=None):
+    """
+    Returns the depth and the estimated cost of an operation, before it is executed
+
+    Every field costs 1 per object it is resolved on, so the fields below a list cost once per estimated item. Lists
+    and connections with a 'first' argument are as long as it, capped like the resolvers do, and other lists are
+    list_size() long. Introspection fields are free.
+    """
+    root_type = schema.get_mutation_type() if operation.operation == 'mutation' else schema.get_query_type()
+    variables = get_variable_values(schema, operation.variable_definitions or [], variable_values)
+    return selection_cost(root_type, operation.selection_set, fragments, variables)
+
+
+def selection_cost(parent_type, selection_set, fragments, variables, page_size=None):
+    depth = cost = 0
+    fields = parent_type.get_fields()
+    for field in collect_fields([selection_set], fragments):
+        name = field.name.value
+        if name.startswith('__') or name not in fields:
+            continue
+        field_def = fields[name]
+        field_type = get_nullable_type(field_def.type)
+
+        paginated = any(argument.name == 'first' for argument in field_def.args)
+        first = get_argument_values(field_def.args, field.arguments, variables).get('first') if paginated else None
+        if isinstance(field_type, GraphQLList):
+            # The edges of a connection are a page long
+            size = page_length(first, page_size or list_size())
+            child_page_size = None
+        else:
+            size = 1
+            child_page_size = page_length(first) if paginated else None
+
+        child_depth = child_cost = 0
+        if field.selection_set:
+            child_depth, child_cost = selection_cost(get_named_type(field_type), field.selection_set, fragments,
+                                                     variables, child_page_size)
+        depth = max(depth, 1 + child_depth)
+        cost += 1 + size * child_cost
+    return depth, cost
+
+
+def check_complexity(schema, operation, fragments, variable_values=None):
+    """
+    Returns the depth and the estimated cost of an operation, or raises QueryTooComplex if either is too high
+    """
+    depth, cost = analyze(schema, operation, fragments, variable_values)
+    if max_depth() is not None and depth > max_depth():
+        raise QueryTooComplex('Query depth {depth} exceeds the maximum of {max}'.format(depth=depth, max=max_depth()))
+    if max_cost() is not None and cost > max_cost():
+        raise QueryTooComplex('Query cost {cost} exceeds the maximum of {max}'.format(cost=cost, max=max_cost()))
+    return depth, cost
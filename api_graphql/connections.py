@@ -0,0 +1,119 @@
+import base64
+import json
+
+import graphene
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from graphql.language import ast
+
+
+DEFAULT_PAGE_SIZE = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+MAX_PAGE_SIZE = 100
+
+
+class PageInfo(graphene.ObjectType):
+    """
+    Pagination info description
+    """
+    name = 'Page Info'
+
+    has_next_page = graphene.Boolean()
+    end_cursor = graphene.String()
+
+
+def connection_type(node_type, name):
+    """
+    Creates a Relay style connection type (edges { cursor node } pageInfo) for the given object type
+    """
+    edge_type = type('{name}Edge'.format(name=name), (graphene.ObjectType,), {
+        'cursor': graphene.String(),
+        'node': graphene.Field(node_type),
+    })
+    return type('{name}Connection'.format(name=name), (graphene.ObjectType,), {
+        'edge_type': edge_type,
+        'edges': graphene.List(edge_type),
+        'page_info': graphene.Field(PageInfo),
+    })
+
+
+def page_length(first, default=DEFAULT_PAGE_SIZE):
+    """
+    Returns how many items to return for a 'first' argument, between 1 and MAX_PAGE_SIZE, or the default without one
+    """
+    return max(1, min(first or default, MAX_PAGE_SIZE))
+
+
+def connection_field(connection):
+    return graphene.Field(connection, first=graphene.Int(), after=graphene.String())
+
+
+def collect_fields(selection_sets, fragments):
+    for selection_set in selection_sets:
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, ast.FragmentSpread):
+                yield from collect_fields([fragments[selection.name.value].selection_set], fragments)
+            elif isinstance(selection, ast.InlineFragment):
+                yield from collect_fields([selection.selection_set], fragments)
+            else:
+                yield selection
+
+
+def selected_fields(info, *path):
+    """
+    Returns the names of the fields selected below the given path of field names, like ('edges', 'node')
+
+    Fragments are followed, and directives are ignored, so a field that may be skipped counts as selected.
+    """
+    selection_sets = [field_ast.selection_set for field_ast in info.field_asts]
+    for name in path:
+        selection_sets = [field.selection_set for field in collect_fields(selection_sets, info.fragments)
+                          if field.name.value == name]
+    return {field.name.value for field in collect_fields(selection_sets, info.fragments)}
+
+
+def encode_cursor(obj, field):
+    value = obj._meta.get_field(field).value_to_string(obj)
+    return base64.urlsafe_b64encode(json.dumps([value, obj.pk]).encode()).decode()
+
+
+def decode_cursor(cursor, model, field):
+    """
+    Returns the value of the field and the primary key in the cursor, converted like the fields of the model would
+    """
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return model._meta.get_field(field).to_python(value), model._meta.pk.to_python(pk)
+    except (ValueError, TypeError, ValidationError):
+        raise ValueError('Invalid cursor')
+
+
+def paginate(connection, queryset, ordering, args):
+    """
+    Fetches one page of the queryset by keyset on (ordering, pk), so any page costs the same as the first
+
+    The ordering is a single field name, descending if prefixed with '-', which should be indexed.
+    """
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    first = page_length(args.get('first'))
+
+    after = args.get('after')
+    if after:
+        value, pk = decode_cursor(after, queryset.model, field)
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{'{field}__{lookup}'.format(field=field, lookup=lookup): value}) |
+            Q(**{field: value, 'pk__{lookup}'.format(lookup=lookup): pk})
+        )
+
+    prefix = '-' if descending else ''
+    nodes = list(queryset.order_by(prefix + field, prefix + 'pk')[:first + 1])
+    has_next_page = len(nodes) > first
+    nodes = nodes[:first]
+
+    edges = [connection.edge_type(cursor=encode_cursor(node, field), node=node) for node in nodes]
+    return connection(
+        edges=edges,
+        page_info=PageInfo(has_next_page=has_next_page, end_cursor=edges[-1].cursor if edges else None)
+    )
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from graphql import Source, parse, validate
+
+from data_models.cache import RepresentationCache
+
+
+# Parsed and validated documents by the hash of their query, see get_document()
+document_cache = RepresentationCache('GRAPHQL_DOCUMENT_CACHE')
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def get_document(schema, query):
+    """
+    Returns the parsed document of a query and its validation errors, parsing and validating it on a cache miss
+
+    The schema never changes while the process runs, so documents are only identified by the hash of their query.
+    Syntax errors are raised and not cached.
+    """
+    key = query_hash(query)
+    cached = document_cache.get('document', key, '')
+    if cached is None:
+        document_ast = parse(Source(query, name='GraphQL request'))
+        cached = (document_ast, validate(schema, document_ast))
+        document_cache.set('document', key, '', cached)
+    return cached
+
+
+class PersistedQueries(object):
+    """
+    The queries registered as .graphql files in GRAPHQL_PERSISTED_QUERIES, by the SHA-256 hash of the file contents
+
+    Clients send '"id": "<hash>"' instead of the query. The files are read once per process.
+    """
+
+    def __init__(self):
+        self._queries = {}
+        self.lock = threading.Lock()
+
+    def directory(self):
+        return getattr(settings, 'GRAPHQL_PERSISTED_QUERIES', None)
+
+    def load(self, directory):
+        queries = {}
+        if directory is not None and os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith('.graphql'):
+                    with open(os.path.join(directory, filename), encoding='utf-8') as query_file:
+                        query = query_file.read()
+                    queries[query_hash(query)] = (filename, query)
+        return queries
+
+    def all(self):
+        """
+        Returns (file name, query) by hash of every registered query
+        """
+        directory = self.directory()
+        with self.lock:
+            if directory not in self._queries:
+                self._queries[directory] = self.load(directory)
+            return self._queries[directory]
+
+    def get(self, query_id):
+        filename, query = self.all().get(query_id, (None, None))
+        return query
+
+
+persisted_queries = PersistedQueries()
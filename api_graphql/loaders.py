@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from graphql.execution.executors.sync import SyncExecutor
+from promise import Promise
+
+from data_models.models import Article, ArticleVersion, Category, Member
+
+
+class Loader(object):
+    """
+    Collects the keys requested while resolving one level of a query, and loads them all with a single query
+
+    The batch function gets a list of keys and must return a list of values in the same order.
+    Every key is loaded at most once per request.
+    """
+
+    def __init__(self, batch_load_fn, batch=True):
+        self.batch_load_fn = batch_load_fn
+        self.batch = batch
+        self.cache = {}
+        self.queue = []
+
+    def load(self, key):
+        if key is None:
+            return Promise.resolve(None)
+        if key not in self.cache:
+            self.cache[key] = Promise()
+            self.queue.append(key)
+            if not self.batch:
+                self.dispatch()
+        return self.cache[key]
+
+    def prime(self, key, value):
+        if key not in self.cache:
+            self.cache[key] = Promise.resolve(value)
+
+    def dispatch(self):
+        keys, self.queue = self.queue, []
+        if not keys:
+            return False
+        try:
+            values = self.batch_load_fn(keys)
+        except Exception as error:
+            for key in keys:
+                self.cache.pop(key).reject(error)
+        else:
+            for key, value in zip(keys, values):
+                self.cache[key].fulfill(value)
+        return True
+
+
+def objects_by_id(queryset):
+    def batch_load(ids):
+        objects = queryset.in_bulk(ids)
+        return [objects.get(id) for id in ids]
+    return batch_load
+
+
+def objects_by_foreign_key(queryset, field):
+    def batch_load(ids):
+        groups = defaultdict(list)
+        for obj in queryset.filter(**{'{field}__in'.format(field=field): ids}):
+            groups[getattr(obj, field)].append(obj)
+        return [groups[id] for id in ids]
+    return batch_load
+
+
+class Loaders(object):
+    """
+    The request scoped loaders used by the resolvers in the schema
+
+    Articles and article versions are only loaded if they are accessible with the access bitmask of the user.
+    """
+
+    def __init__(self, access=Article.ACCESS.ALL, batch=True):
+        self.access = access
+        articles = Article.objects.accessible(access)
+        article_versions = ArticleVersion.objects.accessible(access)
+        self.members = Loader(objects_by_id(Member.objects.all()), batch)
+        self.categories = Loader(objects_by_id(Category.objects.all()), batch)
+        self.articles = Loader(objects_by_id(articles), batch)
+        self.article_versions = Loader(objects_by_id(article_versions), batch)
+        self.articles_by_category = Loader(
+            objects_by_foreign_key(articles.order_by('pk'), 'category_id'), batch)
+        self.versions_by_article = Loader(
+            objects_by_foreign_key(article_versions.order_by('created_at'), 'parent_article_id'), batch)
+        self.versions_by_member = Loader(
+            objects_by_foreign_key(article_versions.order_by('created_at'), 'created_by_id'), batch)
+        # Keyed by model instance, since the model managers resolve these for instances
+        self.authors = Loader(self.load_authors, batch)
+        self.contributions_by_article = Loader(self.load_contributions_by_article, batch)
+
+    @staticmethod
+    def load_authors(articles):
+        return [article.authors() for article in Article.objects.attach_authors(articles)]
+
+    def load_contributions_by_article(self, members):
+        return [member.contributions_by_article()
+                for member in Member.objects.attach_contributions_by_article(members, self.access)]
+
+    def __iter__(self):
+        return iter(loader for loader in vars(self).values() if isinstance(loader, Loader))
+
+    # Returns whether anything was loaded, since loading may have queued keys for the next level
+    def dispatch(self):
+        return any([loader.dispatch() for loader in self])
+
+
+def get_loaders(context):
+    """
+    Returns the loaders of the request, or non-batching loaders when executed outside of a BatchingExecutor
+    """
+    try:
+        return context.loaders
+    except AttributeError:
+        return Loaders(Article.allowed_access(getattr(context, 'user', None)), batch=False)
+
+
+class BatchingExecutor(SyncExecutor):
+    """
+    Executes a query, dispatching the queued keys of the loaders one tree level at a time
+    """
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+
+    def wait_until_finished(self):
+        while self.loaders.dispatch():
+            pass
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api_graphql.documents import get_document, persisted_queries
+from api_graphql.schema import schema
+
+
+class Command(BaseCommand):
+    help = ('Lists the id of every persisted query in GRAPHQL_PERSISTED_QUERIES, which clients send instead of the '
+            'query, and checks that the queries are valid')
+
+    def handle(self, *args, **options):
+        invalid = []
+        for query_id, (filename, query) in sorted(persisted_queries.all().items(), key=lambda item: item[1][0]):
+            try:
+                validation_errors = get_document(schema.schema, query)[1]
+            except Exception as e:
+                validation_errors = [e]
+            if validation_errors:
+                invalid.append(filename)
+            self.stdout.write('{id}  {filename}'.format(id=query_id, filename=filename))
+            for error in validation_errors:
+                self.stderr.write('    {error}'.format(error=error))
+        if invalid:
+            raise CommandError('Invalid persisted queries: {files}'.format(files=', '.join(invalid)))
@@ -1,12 +1,64 @@
 import graphene
+from graphene import with_context
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 
-from data_models.models import Article, ArticleVersion, Category
+from data_models import diffs
+from data_models.models import Article, ArticleVersion, Category, Member
+from data_models.search import search_articles
+
+from .connections import connection_type, connection_field, paginate, page_length, selected_fields
+from .loaders import get_loaders
 
 
 # Types
 
+class DiffSegmentType(graphene.ObjectType):
+    """
+    Diff segment description, where type is -1 for removed, 0 for unchanged and 1 for added text
+    """
+    name = 'Diff Segment'
+
+    type = graphene.Int()
+    text = graphene.String()
+
+
+class DiffHunkType(graphene.ObjectType):
+    """
+    Diff hunk description, with the lines where it starts in the old and the new text
+    """
+    name = 'Diff Hunk'
+
+    old_start = graphene.Int()
+    new_start = graphene.Int()
+    diff = graphene.List(DiffSegmentType)
+
+
+def segment_types(segments):
+    return [DiffSegmentType(**segment) for segment in segments]
+
+
+def hunk_types(hunks):
+    return [DiffHunkType(old_start=hunk['old_start'], new_start=hunk['new_start'], diff=segment_types(hunk['diff']))
+            for hunk in hunks]
+
+
+def context_lines(args):
+    context = args.get('context')
+    return 3 if context is None else max(context, 0)
+
+
+def compared_versions(article, args):
+    """
+    Returns the versions of the article to compare, without their content, which is only read if not cached
+    """
+    ids = [args.get('from_version'), args.get('to_version')]
+    versions = ArticleVersion.objects.filter(parent_article_id=article.id).defer('content', 'stored_diff').in_bulk(ids)
+    if any(id not in versions for id in ids):
+        raise ValueError('fromVersion and toVersion must be versions of the article')
+    return [versions[id] for id in ids]
+
+
 class ArticleType(graphene.ObjectType):
     """
     Article description
@@ -24,36 +76,56 @@ class ArticleType(graphene.ObjectType):
     category = graphene.Field('CategoryType')
     last_edited_by = graphene.Field('MemberType')
     versions = graphene.List('ArticleVersionType')
-    current_version = graphene.Field('MemberType')
+    current_version = graphene.Field('ArticleVersionType')
     authors = graphene.List('MemberType')
+    version_count = graphene.Int()
+    author_count = graphene.Int()
+    last_edited_at = graphene.String()
+    compare = graphene.List(DiffSegmentType, from_version=graphene.Int(), to_version=graphene.Int(),
+                            mode=graphene.String())
+    compare_hunks = graphene.List(DiffHunkType, from_version=graphene.Int(), to_version=graphene.Int(),
+                                  mode=graphene.String(), context=graphene.Int())
 
     @staticmethod
-    def resolve_created_by(article, args, info):
-        return article.created_by
+    @with_context
+    def resolve_created_by(article, args, context, info):
+        return get_loaders(context).members.load(article.created_by_id)
 
     @staticmethod
-    def resolve_category(article, args, info):
-        return article.category
+    @with_context
+    def resolve_category(article, args, context, info):
+        return get_loaders(context).categories.load(article.category_id)
 
     @staticmethod
-    def resolve_last_edited_by(article, args, info):
-        return article.last_edited_by()
+    @with_context
+    def resolve_last_edited_by(article, args, context, info):
+        return get_loaders(context).members.load(article.last_edited_by_id)
 
     @staticmethod
-    def resolve_versions(article, args, info):
-        return article.versions.all()
+    @with_context
+    def resolve_versions(article, args, context, info):
+        return get_loaders(context).versions_by_article.load(article.id)
 
     @staticmethod
-    def resolve_current_version(article, args, info):
-        return article.current_version
+    @with_context
+    def resolve_current_version(article, args, context, info):
+        return get_loaders(context).article_versions.load(article.current_version_id)
 
     @staticmethod
-    def resolve_authors(article, args, info):
-        return article.authors()
+    @with_context
+    def resolve_authors(article, args, context, info):
+        return get_loaders(context).authors.load(article._root)
 
+    # Compares any two versions of the article, with the diffs cached by the pair of versions
     @staticmethod
-    def resolve_slug(article, args, info):
-        return article.slug()
+    def resolve_compare(article, args, info):
+        return segment_types(diffs.compare_versions(*compared_versions(article, args),
+                                                    mode=args.get('mode') or diffs.CHAR))
+
+    @staticmethod
+    def resolve_compare_hunks(article, args, info):
+        return hunk_types(diffs.compare_versions(*compared_versions(article, args),
+                                                 mode=args.get('mode') or diffs.CHAR, context=context_lines(args)))
 
 
 class ArticleVersionType(graphene.ObjectType):
@@ -68,18 +140,37 @@ class ArticleVersionType(graphene.ObjectType):
     created_at = graphene.String()
     created_by = graphene.Field('MemberType')
     parent_article = graphene.Field('ArticleType')
+    diff_status = graphene.String()
+    diff = graphene.List(DiffSegmentType, mode=graphene.String())
+    diff_hunks = graphene.List(DiffHunkType, mode=graphene.String(), context=graphene.Int())
 
+    # The diffs are null until the diff backend has computed them, which is told by diffStatus
     @staticmethod
-    def resolve_access(article_version, args, info):
-        return article_version.access()
+    def resolve_diff(article_version, args, info):
+        diff = article_version.ready_diff(args.get('mode') or diffs.CHAR)
+        return None if diff is None else segment_types(diff)
 
     @staticmethod
-    def resolve_created_by(article_version, args, info):
-        return article_version.created_by
+    def resolve_diff_hunks(article_version, args, info):
+        hunks = article_version.ready_diff(args.get('mode') or diffs.CHAR, context_lines(args))
+        return None if hunks is None else hunk_types(hunks)
 
     @staticmethod
-    def resolve_parent_article(article_version, args, info):
-        return article_version.parent_article
+    @with_context
+    def resolve_access(article_version, args, context, info):
+        return get_loaders(context).articles.load(article_version.parent_article_id).then(
+            lambda parent_article: parent_article.access
+        )
+
+    @staticmethod
+    @with_context
+    def resolve_created_by(article_version, args, context, info):
+        return get_loaders(context).members.load(article_version.created_by_id)
+
+    @staticmethod
+    @with_context
+    def resolve_parent_article(article_version, args, context, info):
+        return get_loaders(context).articles.load(article_version.parent_article_id)
 
 
 class CategoryType(graphene.ObjectType):
@@ -94,12 +185,9 @@ class CategoryType(graphene.ObjectType):
     articles = graphene.List('ArticleType')
 
     @staticmethod
-    def resolve_articles(category, args, info):
-        return category.articles.all()
-
-    @staticmethod
-    def resolve_slug(category, args, info):
-        return category.slug()
+    @with_context
+    def resolve_articles(category, args, context, info):
+        return get_loaders(context).articles_by_category.load(category.id)
 
 
 class MemberType(graphene.ObjectType):
@@ -131,12 +219,19 @@ class MemberType(graphene.ObjectType):
         return member.get_short_name()
 
     @staticmethod
-    def resolve_contributions_by_article(member, args, info):
-        return member.contributions_by_article()
+    @with_context
+    def resolve_contributions_by_article(member, args, context, info):
+        return get_loaders(context).contributions_by_article.load(member._root)
 
     @staticmethod
-    def resolve_contributions_by_version(member, args, info):
-        return member.contributions_by_version()
+    @with_context
+    def resolve_contributions_by_version(member, args, context, info):
+        return get_loaders(context).versions_by_member.load(member.id)
+
+
+ArticleConnection = connection_type(ArticleType, 'Article')
+ArticleVersionConnection = connection_type(ArticleVersionType, 'ArticleVersion')
+MemberConnection = connection_type(MemberType, 'Member')
 
 
 # Query
@@ -158,11 +253,18 @@ class Query(graphene.ObjectType):
 
     article = graphene.Field(
         ArticleType,
-        id=graphene.Int()
+        id=graphene.Int(),
+        slug=graphene.String()
     )
 
-    all_articles = graphene.List(
-        ArticleType
+    all_articles = connection_field(
+        ArticleConnection
+    )
+
+    search = graphene.List(
+        ArticleType,
+        query=graphene.String(),
+        first=graphene.Int()
     )
 
     article_version = graphene.Field(
@@ -170,8 +272,8 @@ class Query(graphene.ObjectType):
         id=graphene.Int()
     )
 
-    all_article_version = graphene.List(
-        ArticleVersionType
+    all_article_versions = connection_field(
+        ArticleVersionConnection
     )
 
     member = graphene.Field(
@@ -179,45 +281,68 @@ class Query(graphene.ObjectType):
         id=graphene.Int()
     )
 
-    all_members = graphene.List(
-        MemberType
+    all_members = connection_field(
+        MemberConnection
     )
 
     @staticmethod
-    def resolve_category(root, args, info):
+    @with_context
+    def resolve_category(root, args, context, info):
         id = args.get('id')
-        return Category.objects.get(pk=id)
+        return get_loaders(context).categories.load(id)
 
     @staticmethod
     def resolve_all_categories(root, args, info):
         return Category.objects.all()
 
     @staticmethod
-    def resolve_article(root, args, info):
+    @with_context
+    def resolve_article(root, args, context, info):
+        slug = args.get('slug')
+        if slug is not None:
+            return Article.objects.accessible(get_loaders(context).access).filter(slug=slug).first()
         id = args.get('id')
-        return Article.objects.get(pk=id)
+        return get_loaders(context).articles.load(id)
+
+    @staticmethod
+    @with_context
+    def resolve_all_articles(root, args, context, info):
+        articles = Article.objects.accessible(get_loaders(context).access)
+        return paginate(ArticleConnection, articles, '-updated_at', args)
 
     @staticmethod
-    def resolve_all_articles(root, args, info):
-        return Article.objects.all()
+    @with_context
+    def resolve_search(root, args, context, info):
+        first = page_length(args.get('first'), 20)
+        return search_articles(args.get('query') or '', Article.objects.accessible(get_loaders(context).access), first)
 
     @staticmethod
-    def resolve_article_version(root, args, info):
+    @with_context
+    def resolve_article_version(root, args, context, info):
         id = args.get('id')
-        return ArticleVersion.objects.get(pk=id)
+        return get_loaders(context).article_versions.load(id)
 
+    # The content and the stored diff are only read from the database when they are selected
     @staticmethod
-    def resolve_all_article_versions(root, args, info):
-        return ArticleVersion.objects.all()
+    @with_context
+    def resolve_all_article_versions(root, args, context, info):
+        article_versions = ArticleVersion.objects.accessible(get_loaders(context).access)
+        selected = selected_fields(info, 'edges', 'node')
+        if 'content' not in selected:
+            article_versions = article_versions.defer('content')
+        if 'diff' not in selected and 'diffHunks' not in selected:
+            article_versions = article_versions.defer('stored_diff')
+        return paginate(ArticleVersionConnection, article_versions, '-created_at', args)
 
     @staticmethod
-    def resolve_all_users(root, args, info):
-        return User.objects.all()
+    def resolve_all_members(root, args, info):
+        return paginate(MemberConnection, Member.objects.all(), '-date_joined', args)
 
     @staticmethod
-    def resolve_user(root, args, info):
+    @with_context
+    def resolve_member(root, args, context, info):
         id = args.get('id')
-        return User.objects.get(pk=id)
+        return get_loaders(context).members.load(id)
 
 
 # Mutations
@@ -1,3 +1,300 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from data_models.models import Article, ArticleVersion, Category, Member
+
+from .documents import document_cache, query_hash
+
+
+class NestedQueryCountTests(TestCase):
+    """
+    The loaders should resolve each level of a nested query with one query per type
+    """
+
+    def setUp(self):
+        self.members = [Member.objects.create_user('member{i}'.format(i=i), 'member{i}@example.com'.format(i=i))
+                        for i in range(3)]
+        self.categories = [Category.objects.create(title='Category {i}'.format(i=i)) for i in range(2)]
+
+    def create_articles(self, count):
+        Article.objects.bulk_create([
+            Article(title='Article {i}'.format(i=i), category=self.categories[i % 2], created_by=self.members[0])
+            for i in range(count)
+        ])
+        articles = list(Article.objects.all())
+        ArticleVersion.objects.bulk_create([
+            ArticleVersion(content='Content', parent_article=article, created_by=member)
+            for article in articles for member in self.members
+        ])
+        for article in articles:
+            Article.objects.filter(pk=article.pk).update(current_version=article.versions.last())
+        Article.objects.update_statistics()
+
+    def query(self, query):
+        response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(response.content.decode())
+        self.assertNotIn('errors', content)
+        return content['data']
+
+    def assert_query_count(self, article_count, num_queries, query):
+        self.create_articles(article_count)
+        with self.assertNumQueries(num_queries):
+            data = self.query(query)
+        articles = [edge['node'] for edge in data['allArticles']['edges']]
+        self.assertEqual(len(articles), article_count)
+        return articles
+
+    def test_versions_with_authors(self):
+        query = '{ allArticles(first: 100) { edges { node { title versions { id createdBy { username } } } } } }'
+        for article_count in (10, 100):
+            articles = self.assert_query_count(article_count, 3, query)
+            Article.objects.all().delete()
+        self.assertEqual(len(articles[0]['versions']), len(self.members))
+
+    # Resolves tens of thousands of fields, far above the default GRAPHQL_MAX_COST
+    @override_settings(GRAPHQL_MAX_COST=None)
+    def test_deeply_nested_query(self):
+        query = '''{
+            allArticles(first: 100) {
+                edges {
+                    node {
+                        createdBy { username }
+                        lastEditedBy { username }
+                        authors { username }
+                        category { title articles { title } }
+                        versions { access parentArticle { title } createdBy { contributionsByArticle { title } } }
+                    }
+                }
+            }
+        }'''
+        for article_count in (20, 100):
+            articles = self.assert_query_count(article_count, 13, query)
+            Article.objects.all().delete()
+        article = articles[0]
+        self.assertEqual(article['createdBy']['username'], 'member0')
+        self.assertEqual(article['lastEditedBy']['username'], 'member2')
+        self.assertEqual(len(article['authors']), len(self.members))
+        self.assertEqual(len(article['category']['articles']), 50)
+        self.assertEqual(len(article['versions'][0]['createdBy']['contributionsByArticle']), 100)
+
+
+class ConnectionTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        for i in range(25):
+            Article.objects.create(title='Article {i}'.format(i=i), category=category, created_by=self.member)
+
+    def query(self, after=None):
+        arguments = 'first: 10' + (', after: "{after}"'.format(after=after) if after else '')
+        query = '{ allArticles(%s) { pageInfo { hasNextPage endCursor } edges { node { id } } } }' % arguments
+        response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        return json.loads(response.content.decode())['data']['allArticles']
+
+    def test_pages_cover_all_articles_once(self):
+        ids = []
+        after = None
+        for expected_has_next_page in (True, True, False):
+            page = self.query(after)
+            ids += [edge['node']['id'] for edge in page['edges']]
+            self.assertEqual(page['pageInfo']['hasNextPage'], expected_has_next_page)
+            after = page['pageInfo']['endCursor']
+        expected_ids = list(Article.objects.order_by('-updated_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(ids, expected_ids)
+
+    def test_malformed_cursors_are_invalid(self):
+        for value, pk in (('yesterday', 1), ('2016-06-01T12:00:00Z', 'one')):
+            after = base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+            query = '{ allArticles(first: 10, after: "%s") { edges { node { id } } } }' % after
+            response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+            self.assertEqual([error['message'] for error in json.loads(response.content.decode())['errors']],
+                             ['Invalid cursor'])
+
+    def test_negative_first_returns_one_article(self):
+        query = '{ allArticles(first: -1) { edges { node { id } } } }'
+        response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        self.assertEqual(len(json.loads(response.content.decode())['data']['allArticles']['edges']), 1)
+
+    def test_search_returns_at_least_one_article(self):
+        query = '{ search(query: "article", first: -1) { id } }'
+        response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        self.assertEqual(len(json.loads(response.content.decode())['data']['search']), 1)
+
+
+class DeferredContentTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com')
+        article = Article.objects.create(title='Article', category=Category.objects.create(title='Category'),
+                                         created_by=member)
+        ArticleVersion.objects.create(content='Content', parent_article=article, created_by=member)
+
+    def query(self, query):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        nodes = [edge['node'] for edge in json.loads(response.content.decode())['data']['allArticleVersions']['edges']]
+        return nodes, any('"content"' in query['sql'] for query in context.captured_queries)
+
+    def test_content_is_only_read_when_selected(self):
+        self.assertEqual(self.query('{ allArticleVersions { edges { node { createdAt } } } }')[1], False)
+        nodes, read_content = self.query('{ allArticleVersions { edges { node { ...Version } } } } '
+                                         'fragment Version on ArticleVersionType { content }')
+        self.assertEqual(nodes, [{'content': 'Content'}])
+        self.assertTrue(read_content)
+
+
+@override_settings(ARTICLE_VERSION_DIFFS={'BACKEND': 'data_models.diffs.ImmediateDiffBackend'})
+class DiffTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com')
+        self.article = Article.objects.create(title='Article', category=Category.objects.create(title='Category'),
+                                              created_by=member)
+        self.first = ArticleVersion.objects.create(content='One\nTwo\nThree\nFour\n', parent_article=self.article,
+                                                   created_by=member)
+        self.second = ArticleVersion.objects.create(content='One\nTwo\n3\nFour\n', parent_article=self.article,
+                                                    created_by=member)
+        self.third = ArticleVersion.objects.create(content='One\nTwo\n3\n', parent_article=self.article,
+                                                   created_by=member)
+
+    def query(self, query):
+        response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        return json.loads(response.content.decode())['data']
+
+    def test_compare_two_versions(self):
+        data = self.query('{ article(id: %d) { compare(fromVersion: %d, toVersion: %d, mode: "line") { type text } } }'
+                          % (self.article.id, self.first.id, self.third.id))
+        self.assertEqual(data['article']['compare'], [{'type': 0, 'text': 'One\nTwo\n'},
+                                                      {'type': -1, 'text': 'Three\nFour\n'},
+                                                      {'type': 1, 'text': '3\n'}])
+
+    def test_diff_hunks_by_line(self):
+        query = '{ articleVersion(id: %d) { diffStatus diffHunks(mode: "line", context: 1) ' \
+                '{ oldStart diff { type text } } } }' % self.second.id
+        self.assertEqual(self.query(query)['articleVersion'], {
+            'diffStatus': 'ready',
+            'diffHunks': [{'oldStart': 2, 'diff': [{'type': 0, 'text': 'Two\n'}, {'type': -1, 'text': 'Three\n'},
+                                                   {'type': 1, 'text': '3\n'}, {'type': 0, 'text': 'Four\n'}]}],
+        })
+
+
+class ComplexityTests(TestCase):
+    def post(self, query, variables=None):
+        response = self.client.post('/graphql', json.dumps({'query': query, 'variables': variables}),
+                                    content_type='application/json')
+        return response.status_code, json.loads(response.content.decode())
+
+    def test_depth_and_cost_are_reported(self):
+        status, content = self.post('{ allArticles(first: 5) { edges { node { title } } } }')
+        self.assertEqual(status, 200)
+        # 1 connection, 1 list of edges, and 5 nodes with a title each
+        self.assertEqual(content['extensions'], {'complexity': {'depth': 4, 'cost': 12}})
+
+    def test_fragments_and_variables_are_counted(self):
+        query = '''query Articles($first: Int) { allArticles(first: $first) { edges { node { ...Versions } } } }
+            fragment Versions on ArticleType { versions { id } }'''
+        self.assertEqual(self.post(query, {'first': 1})[1]['extensions']['complexity']['cost'], 1 + 1 + 2 + 20)
+        self.assertEqual(self.post(query, {'first': 1000})[1]['extensions']['complexity']['cost'],
+                         1 + 1 + 100 * (2 + 20))
+
+    def test_negative_first_costs_like_one_item(self):
+        query = '{ search(query: "studio", first: %d) { versions { parentArticle { versions { id } } } } }'
+        self.assertEqual(self.post(query % -1)[1]['extensions']['complexity'],
+                         self.post(query % 1)[1]['extensions']['complexity'])
+        self.assertGreater(self.post(query % -1)[1]['extensions']['complexity']['cost'], 0)
+
+    @override_settings(GRAPHQL_MAX_DEPTH=5)
+    def test_too_deep_queries_are_rejected_before_execution(self):
+        query = '{ allArticles { edges { node { versions { parentArticle { title } } } } } }'
+        with self.assertNumQueries(0):
+            status, content = self.post(query)
+        self.assertEqual(status, 400)
+        self.assertEqual(content['errors'][0]['message'], 'Query depth 6 exceeds the maximum of 5')
+        self.assertNotIn('data', content)
+
+    @override_settings(GRAPHQL_MAX_COST=1000)
+    def test_too_expensive_queries_are_rejected_before_execution(self):
+        query = '{ allCategories { articles { versions { id } } } }'
+        with self.assertNumQueries(0):
+            status, content = self.post(query)
+        self.assertEqual(status, 400)
+        self.assertEqual(content['errors'][0]['message'], 'Query cost 8421 exceeds the maximum of 1000')
+
+
+class PersistedQueryTests(TestCase):
+    query = '{ allCategories { title } }\n'
+
+    def setUp(self):
+        Category.objects.create(title='Category')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, 'categories.graphql'), 'w') as query_file:
+            query_file.write(self.query)
+        settings = override_settings(GRAPHQL_PERSISTED_QUERIES=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def post(self, body):
+        response = self.client.post('/graphql', json.dumps(body), content_type='application/json')
+        return response.status_code, json.loads(response.content.decode())
+
+    def test_persisted_query_by_id(self):
+        expected = self.post({'query': self.query})[1]['data']
+        self.assertEqual(self.post({'id': query_hash(self.query)}), (200, {'data': expected, 'extensions': {
+            'complexity': {'depth': 2, 'cost': 21}}}))
+        response = self.client.get('/graphql', {'id': query_hash(self.query)})
+        self.assertEqual(json.loads(response.content.decode())['data'], expected)
+
+    def test_unknown_persisted_query(self):
+        status, content = self.post({'id': query_hash('{ allMembers { edges { node { email } } } }')})
+        self.assertEqual(status, 400)
+        self.assertTrue(content['errors'][0]['message'].startswith('Unknown persisted query'))
+
+    def test_documents_are_parsed_and_validated_once(self):
+        document_cache.clear()
+        hits, misses = document_cache.hits, document_cache.misses
+        for _ in range(3):
+            self.assertEqual(self.post({'query': '{ allCategories { title } }'})[0], 200)
+            self.assertEqual(self.post({'query': '{ allCategories { name } }'})[0], 400)
+        self.assertEqual((document_cache.hits - hits, document_cache.misses - misses), (4, 2))
+
+
+class AccessTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com', 'password')
+        Member.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        self.category = Category.objects.create(title='Category')
+        for access, title in Article.ACCESS_CHOICES:
+            article = Article.objects.create(title=str(title), category=self.category, created_by=member,
+                                             access=access)
+            ArticleVersion.objects.create(content='Content', parent_article=article, created_by=member)
+
+    def query(self, query):
+        response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        return json.loads(response.content.decode())['data']
+
+    def titles(self):
+        data = self.query('{ allArticles { edges { node { title } } } '
+                          'category(id: %d) { articles { title } } }' % self.category.id)
+        return (sorted(edge['node']['title'] for edge in data['allArticles']['edges']),
+                sorted(article['title'] for article in data['category']['articles']))
+
+    def test_anonymous_user_sees_public_articles(self):
+        self.assertEqual(self.titles(), (['All'], ['All']))
+        restricted = Article.objects.get(access=Article.ACCESS.STAFF)
+        self.assertIsNone(self.query('{ article(id: %d) { title } }' % restricted.id)['article'])
+
+    def test_article_by_slug(self):
+        self.assertEqual(self.query('{ article(slug: "all") { title slug } }')['article'],
+                         {'title': 'All', 'slug': 'all'})
+        self.assertIsNone(self.query('{ article(slug: "staff") { title } }')['article'])
+
+    def test_staff_sees_staff_articles(self):
+        self.client.login(username='staff', password='password')
+        titles = ['All', 'Staff', 'Staff or superuser']
+        self.assertEqual(self.titles(), (titles, titles))
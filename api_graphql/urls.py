@@ -1,11 +1,10 @@
 from django.conf.urls import url
 from django.views.decorators.csrf import csrf_exempt
 
-from graphene.contrib.django.views import GraphQLView
-
 from .schema import schema
+from .views import BatchingGraphQLView
 
 
 urlpatterns = [
-    url(r'^', csrf_exempt(GraphQLView.as_view(schema=schema))),
+    url(r'^', csrf_exempt(BatchingGraphQLView.as_view(schema=schema))),
 ]
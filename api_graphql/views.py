@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene.contrib.django.views import GraphQLView
+from graphql_django_view import HttpError
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult
+from graphql.language import ast
+from graphql.utils.get_operation_ast import get_operation_ast
+
+from data_models.models import Article
+from revoltwiki.instrumentation import measure_serialization, tag_request
+
+from .complexity import QueryTooComplex, check_complexity
+from .documents import get_document, persisted_queries
+from .loaders import Loaders, BatchingExecutor
+
+
+class BatchingGraphQLView(GraphQLView):
+    """
+    GraphQL view that gives every request its own loaders, batching the database lookups of the resolvers
+
+    The loaders only load the articles and article versions the user of the request can access.
+    Queries deeper than GRAPHQL_MAX_DEPTH or estimated to cost more than GRAPHQL_MAX_COST are rejected before they
+    are executed (see complexity.py), and the depth and cost are reported in the 'extensions' of the response.
+    Queries are parsed and validated once per process (see documents.py), and persisted queries are sent by their id.
+    """
+
+    def get_context(self, request):
+        request.loaders = Loaders(Article.allowed_access(request.user))
+        return request
+
+    # Like GraphQLView.execute_graphql_request(), with persisted queries and the cache of parsed documents
+    def execute_graphql_request(self, request):
+        data = self.parse_body(request)
+        query, variables, operation_name = self.get_graphql_params(request, data)
+        query_id = request.GET.get('id') or data.get('id')
+        if query_id and not query:
+            query = persisted_queries.get(query_id)
+            if query is None:
+                raise HttpError(HttpResponseBadRequest('Unknown persisted query {id}.'.format(id=query_id)))
+
+        if not query:
+            raise HttpError(HttpResponseBadRequest('Must provide query string.'))
+
+        try:
+            document_ast, validation_errors = get_document(self.schema, query)
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+        if validation_errors:
+            return ExecutionResult(errors=validation_errors, invalid=True)
+
+        if request.method.lower() == 'get':
+            operation_ast = get_operation_ast(document_ast, operation_name)
+            if operation_ast and operation_ast.operation != 'query':
+                raise HttpError(HttpResponseNotAllowed(
+                    ['POST'], 'Can only perform a {} operation from a POST request.'.format(operation_ast.operation)
+                ))
+
+        try:
+            return self.execute(
+                document_ast,
+                root_value=self.get_root_value(request),
+                variable_values=variables,
+                operation_name=operation_name,
+                context_value=self.get_context(request)
+            )
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
+    def execute(self, document_ast, *args, **kwargs):
+        request = kwargs['context_value']
+        operation = get_operation_ast(document_ast, kwargs.get('operation_name'))
+        if operation is not None:
+            tag_request(request, 'graphql {operation} {name}'.format(
+                operation=operation.operation, name=operation.name.value if operation.name else '<anonymous>'))
+            fragments = {definition.name.value: definition for definition in document_ast.definitions
+                         if isinstance(definition, ast.FragmentDefinition)}
+            try:
+                depth, cost = check_complexity(self.schema, operation, fragments, kwargs.get('variable_values'))
+            except QueryTooComplex as e:
+                return ExecutionResult(errors=[e], invalid=True)
+            except GraphQLError:
+                # Invalid variables are reported by the execution
+                pass
+            else:
+                request.graphql_complexity = OrderedDict([('depth', depth), ('cost', cost)])
+        kwargs['executor'] = BatchingExecutor(request.loaders)
+        return super(BatchingGraphQLView, self).execute(document_ast, *args, **kwargs)
+
+    def json_encode(self, request, d):
+        complexity = getattr(request, 'graphql_complexity', None)
+        if complexity is not None:
+            d['extensions'] = {'complexity': complexity}
+        with measure_serialization(request):
+            return super(BatchingGraphQLView, self).json_encode(request, d)
@@ -0,0 +1,54 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ConditionalRetrieveMixin(object):
+    """
+    Answers conditional GET requests for a single object with 304 Not Modified, without serializing it
+
+    Views using it implement get_etag_key(obj), which has to change whenever the representation does,
+    and get_last_modified(obj).
+    """
+
+    def get_etag_key(self, obj):
+        raise NotImplementedError
+
+    def get_last_modified(self, obj):
+        raise NotImplementedError
+
+    def get_cache_control(self, obj):
+        return None
+
+    # The representation also depends on the renderer, so it is part of the strong ETag
+    def get_etag(self, obj):
+        key = '{key}:{format}'.format(key=self.get_etag_key(obj), format=self.request.accepted_renderer.format)
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and timegm(last_modified.utctimetuple()) <= if_modified_since
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self.get_etag(instance)
+        last_modified = self.get_last_modified(instance)
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(self.get_serializer(instance).data)
+
+        response['ETag'] = quote_etag(etag)
+        response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+        cache_control = self.get_cache_control(instance)
+        if cache_control:
+            response['Cache-Control'] = cache_control
+        return response
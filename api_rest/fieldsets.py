@@ -0,0 +1,56 @@
+import hashlib
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ValidationError
+
+
+class SparseFieldsetMixin(object):
+    """
+    Lets clients pick the fields of the representations they read with '?fields=<name>,<name>'
+
+    Model fields that are only needed by fields which are not picked, listed in deferred_fields, are deferred
+    in the queryset, so large columns are never read unless they are requested. Writes always use every field.
+    """
+    fieldset_param = 'fields'
+    # Maps serializer fields to the model fields only they need
+    deferred_fields = {}
+
+    def get_fieldset(self):
+        """
+        Returns the picked serializer fields in the order of the serializer, or None if every field is used
+
+        Picking no fields, as with '?fields=', is the same as not picking any fieldset.
+        """
+        fields = self.request.query_params.get(self.fieldset_param, '')
+        picked = {name.strip() for name in fields.split(',') if name.strip()}
+        if not picked or self.request.method not in SAFE_METHODS:
+            return None
+        available = self.get_serializer_class().Meta.fields
+        unknown = picked.difference(available)
+        if unknown:
+            raise ValidationError({self.fieldset_param: ['Unknown fields: {fields}'.format(
+                fields=', '.join(sorted(unknown)))]})
+        return tuple(name for name in available if name in picked)
+
+    def defer_unrequested(self, queryset):
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return queryset
+        deferred = [model_field for field, model_fields in sorted(self.deferred_fields.items())
+                    if field not in fieldset for model_field in model_fields]
+        return queryset.defer(*deferred) if deferred else queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault('fields', fieldset)
+        return super(SparseFieldsetMixin, self).get_serializer(*args, **kwargs)
+
+    # The representation depends on the fieldset, so it is part of the ETag (see ConditionalRetrieveMixin)
+    def get_etag(self, obj):
+        etag = super(SparseFieldsetMixin, self).get_etag(obj)
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return etag
+        key = '{etag}:{fields}'.format(etag=etag, fields=','.join(fieldset))
+        return hashlib.md5(key.encode()).hexdigest()
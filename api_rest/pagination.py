@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ArticleCursorPagination(CursorPagination):
+    """
+    Paginates articles by keyset on the indexed 'updated_at' column, so deep pages cost the same as the first
+    """
+    ordering = '-updated_at'
+
+
+class ArticleVersionCursorPagination(CursorPagination):
+    """
+    Paginates article versions by keyset on the indexed 'created_at' column
+    """
+    ordering = '-created_at'
+
+
+class MemberCursorPagination(CursorPagination):
+    """
+    Paginates members by keyset on the indexed 'date_joined' column
+    """
+    ordering = '-date_joined'
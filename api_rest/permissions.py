@@ -126,8 +126,8 @@ class ArticleVersionPermissions(BasePermission):
         Permissions to detail view
         """
 
-        # Expecting the obj to be an article version
-        if type(obj) is not ArticleVersion:
+        # Expecting the obj to be an article version, possibly with deferred fields (see SparseFieldsetMixin)
+        if not isinstance(obj, ArticleVersion):
             raise TypeError('Expected ArticleVersion type, but got {type}'.format(type=type(obj)))
 
         # Everyone can view
@@ -136,3 +136,31 @@ class ArticleVersionPermissions(BasePermission):
 
         # No one can do anything else
         return False
+
+
+class ExportPermissions(BasePermission):
+    """
+    Permissions that describes access rights to the export of the whole wiki
+    """
+
+    def has_permission(self, request, view):
+        """
+        Permissions to the export
+        """
+
+        # The export contains every article regardless of access, so only superusers can export
+        return request.user.is_superuser
+
+
+class StatisticsPermissions(BasePermission):
+    """
+    Permissions that describes access rights to statistics about the server
+    """
+
+    def has_permission(self, request, view):
+        """
+        Permissions to the statistics
+        """
+
+        # Only superusers can view statistics
+        return request.user.is_superuser
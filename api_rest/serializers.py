@@ -1,18 +1,174 @@
+from django.db import models
 from rest_framework import serializers
 
+from data_models import diffs
+from data_models.cache import representation_cache
 from data_models.models import Article, ArticleVersion, Category, Member
+from revoltwiki.instrumentation import measure_serialization
 
 
-class ArticleVersionSerializer(serializers.HyperlinkedModelSerializer):
-    diff = serializers.JSONField()
+def get_access(context):
+    """
+    Returns the access bitmask of the user of the request in the serializer context, or that of anonymous users
+    """
+    request = context.get('request')
+    if request is None:
+        return Article.ACCESS.ALL
+    return Article.allowed_access(request.user)
+
+
+class MeasuredSerializationMixin(object):
+    """
+    Adds the time spent turning the instances into data to the serialization time of the request, if it is
+    instrumented (see revoltwiki.instrumentation)
+    """
+
+    @property
+    def data(self):
+        with measure_serialization(self.context.get('request')):
+            return super(MeasuredSerializationMixin, self).data
+
+
+class MeasuredListSerializer(MeasuredSerializationMixin, serializers.ListSerializer):
+    pass
+
+
+class CachedRepresentationMixin(object):
+    """
+    Serves the representation of an object from the representation cache, and stores it there on a miss
+
+    The hyperlinks depend on the host of the request, and the representation may depend on the access of the
+    viewer, so both are part of the cache key.
+    """
+    cache_kind = None
+
+    def get_cache_variant(self):
+        request = self.context.get('request')
+        if request is None:
+            return '{access}:'.format(access=Article.ACCESS.ALL)
+        return '{access}:{base}'.format(access=Article.allowed_access(request.user),
+                                        base=request.build_absolute_uri('/'))
+
+    def get_cached_representation(self, instance):
+        return representation_cache.get(self.cache_kind, instance.pk, self.get_cache_variant())
+
+    def is_cacheable(self, instance):
+        return True
+
+    def cache_representation(self, instance):
+        data = super(CachedRepresentationMixin, self).to_representation(instance)
+        if self.is_cacheable(instance):
+            representation_cache.set(self.cache_kind, instance.pk, self.get_cache_variant(), data)
+        return data
+
+    def to_representation(self, instance):
+        data = self.get_cached_representation(instance)
+        if data is None:
+            data = self.cache_representation(instance)
+        return data
+
+
+class SparseFieldsetSerializerMixin(object):
+    """
+    Takes the names of the fields to use as the keyword argument 'fields' (see SparseFieldsetMixin)
+
+    The fieldset is part of the cache variant, so it has to come before CachedRepresentationMixin.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.fieldset = kwargs.pop('fields', None)
+        super(SparseFieldsetSerializerMixin, self).__init__(*args, **kwargs)
+        if self.fieldset is not None:
+            for name in set(self.fields).difference(self.fieldset):
+                self.fields.pop(name)
+
+    def get_cache_variant(self):
+        variant = super(SparseFieldsetSerializerMixin, self).get_cache_variant()
+        if self.fieldset is None:
+            return variant
+        return '{variant}:{fields}'.format(variant=variant, fields=','.join(self.fieldset))
+
+
+class ArticleVersionListSerializer(MeasuredListSerializer):
+    """
+    Resolves the previous versions of all listed versions with a constant number of queries, when their word or
+    line diffs are asked for
+
+    Versions with a cached representation are served from the cache, and their previous versions are not resolved.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        representations = []
+        uncached = []
+        for article_version in iterable:
+            representation = self.child.get_cached_representation(article_version)
+            representations.append(representation)
+            if representation is None:
+                uncached.append(article_version)
+        if 'diff' in self.child.fields and self.context.get('diff_mode', diffs.CHAR) != diffs.CHAR:
+            ArticleVersion.objects.attach_previous_versions(
+                [article_version for article_version in uncached
+                 if article_version.diff_status == ArticleVersion.DIFF_STATUS.READY])
+        uncached = iter([self.child.cache_representation(article_version) for article_version in uncached])
+        return [representation if representation is not None else next(uncached)
+                for representation in representations]
+
+
+class ArticleVersionSerializer(MeasuredSerializationMixin,
+                               SparseFieldsetSerializerMixin,
+                               CachedRepresentationMixin,
+                               serializers.HyperlinkedModelSerializer):
+    # The content is stored compressed, in a binary column
+    content = serializers.CharField(style={'base_template': 'textarea.html'})
+    diff = serializers.SerializerMethodField()
+    base_version = serializers.IntegerField(write_only=True, required=False, allow_null=True,
+                                            help_text='The id of the current version the edit is based on')
+    cache_kind = 'article_version'
 
     class Meta:
         model = ArticleVersion
-        fields = ('id', 'url', 'content', 'access', 'parent_article', 'created_at', 'created_by', 'diff')
-        read_only_fields = ('id', 'url', 'access', 'created_at', 'created_by', 'diff')
+        fields = ('id', 'url', 'content', 'access', 'parent_article', 'created_at', 'created_by', 'diff',
+                  'diff_status', 'base_version')
+        read_only_fields = ('id', 'url', 'access', 'created_at', 'created_by', 'diff', 'diff_status')
+        list_serializer_class = ArticleVersionListSerializer
+
+    # Saving the version checks that the base version is still the current version (see Article.record_version)
+    def create(self, validated_data):
+        base_version_id = validated_data.pop('base_version', None)
+        article_version = ArticleVersion(**validated_data)
+        article_version.base_version_id = base_version_id
+        article_version.save()
+        return article_version
+
+    # The view may ask for another diff mode, or for hunks with context lines (see ArticleVersionViewSet)
+    def get_cache_variant(self):
+        variant = super(ArticleVersionSerializer, self).get_cache_variant()
+        return '{variant}:{mode}:{context}'.format(variant=variant, mode=self.context.get('diff_mode', diffs.CHAR),
+                                                   context=self.context.get('diff_context'))
+
+    # The diff is null until the diff backend has computed it, which is told by diff_status
+    def get_diff(self, article_version):
+        return article_version.ready_diff(self.context.get('diff_mode', diffs.CHAR), self.context.get('diff_context'))
+
+    # The representation of a version changes when its diff is ready, possibly in another process
+    def is_cacheable(self, article_version):
+        return article_version.diff_status == ArticleVersion.DIFF_STATUS.READY
 
 
-class MemberSerializer(serializers.HyperlinkedModelSerializer):
+class MemberListSerializer(MeasuredListSerializer):
+    """
+    Resolves the contributed articles of all listed members with a constant number of queries
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        return super(MemberListSerializer, self).to_representation(
+            Member.objects.attach_contributions_by_article(iterable, get_access(self.context))
+        )
+
+
+class MemberSerializer(MeasuredSerializationMixin, serializers.HyperlinkedModelSerializer):
     contributions_by_article = serializers.HyperlinkedRelatedField(many=True, read_only=True,
                                                                    view_name='article-detail')
 
@@ -31,22 +187,62 @@ class MemberSerializer(serializers.HyperlinkedModelSerializer):
                 }
             },
         }
+        list_serializer_class = MemberListSerializer
+
+    # Only the articles the viewer can access are listed. The versions are filtered by the view (see MemberViewSet).
+    def to_representation(self, member):
+        if not hasattr(member, '_contributions_by_article_cache'):
+            Member.objects.attach_contributions_by_article([member], get_access(self.context))
+        return super(MemberSerializer, self).to_representation(member)
+
 
+class ArticleListSerializer(MeasuredListSerializer):
+    """
+    Resolves the authors of all listed articles with a constant number of queries
 
-class ArticleSerializer(serializers.HyperlinkedModelSerializer):
+    Articles with a cached representation are served from the cache, and their authors are not resolved.
+    Neither are they when the authors are left out of the fieldset.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        representations = []
+        uncached = []
+        for article in iterable:
+            representation = self.child.get_cached_representation(article)
+            representations.append(representation)
+            if representation is None:
+                uncached.append(article)
+        if 'authors' in self.child.fields:
+            uncached = Article.objects.attach_authors(uncached)
+        uncached = iter([self.child.cache_representation(article) for article in uncached])
+        return [representation if representation is not None else next(uncached)
+                for representation in representations]
+
+
+class ArticleSerializer(MeasuredSerializationMixin,
+                        SparseFieldsetSerializerMixin,
+                        CachedRepresentationMixin,
+                        serializers.HyperlinkedModelSerializer):
+    cache_kind = 'article'
     authors = serializers.HyperlinkedRelatedField(many=True, read_only=True, view_name='member-detail')
     last_edited_by = serializers.HyperlinkedRelatedField(read_only=True, view_name='member-detail')
 
     class Meta:
         model = Article
         fields = ('id', 'url', 'title', 'category', 'slug', 'access', 'current_version', 'deleted', 'created_at',
-                  'updated_at', 'created_by', 'versions', 'authors', 'last_edited_by')
+                  'updated_at', 'created_by', 'versions', 'authors', 'version_count', 'author_count',
+                  'last_edited_by', 'last_edited_at')
         read_only_fields = ('id', 'url', 'slug', 'created_at', 'updated_at', 'created_by',
-                            'versions', 'authors', 'last_edited_by')
+                            'versions', 'authors', 'version_count', 'author_count', 'last_edited_by', 'last_edited_at')
+        list_serializer_class = ArticleListSerializer
+
 
+class CategorySerializer(MeasuredSerializationMixin, CachedRepresentationMixin, serializers.HyperlinkedModelSerializer):
+    cache_kind = 'category'
 
-class CategorySerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Category
         fields = ('id', 'url', 'title', 'slug', 'articles')
         read_only_fields = ('id', 'url', 'articles')
+        list_serializer_class = MeasuredListSerializer
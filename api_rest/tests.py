@@ -1,3 +1,540 @@
-from django.test import TestCase
+import json
+from collections import deque
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIRequestFactory
+
+from data_models.cache import comparison_cache, representation_cache
+from data_models.diffs import process_diff
+from data_models.models import Article, ArticleVersion, Category, Member
+from revoltwiki.instrumentation import fingerprint, recorder
+
+from .views import ArticleViewSet
+
+
+class ArticleListQueryCountTests(TestCase):
+    """
+    Rendering a page of articles should cost the same number of queries regardless of its size
+    """
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.members = [Member.objects.create_user('member{i}'.format(i=i), 'member{i}@example.com'.format(i=i))
+                        for i in range(3)]
+        self.category = Category.objects.create(title='Category')
+        # The articles are created in bulk, which does not invalidate the representation cache
+        representation_cache.clear()
+
+    def create_articles(self, count):
+        Article.objects.bulk_create([
+            Article(title='Article {i}'.format(i=i), category=self.category, created_by=self.members[0])
+            for i in range(count)
+        ])
+        articles = list(Article.objects.all())
+        ArticleVersion.objects.bulk_create([
+            ArticleVersion(content='Content', parent_article=article, created_by=member)
+            for article in articles for member in self.members
+        ])
+        for article in articles:
+            Article.objects.filter(pk=article.pk).update(current_version=article.versions.last())
+        Article.objects.update_statistics()
+
+    def assert_list_query_count(self, page_size):
+        self.create_articles(page_size)
+        view = ArticleViewSet.as_view({'get': 'list'}, pagination_class=None)
+        with self.assertNumQueries(4):
+            response = view(self.factory.get('/api/articles/'))
+        self.assertEqual(len(response.data), page_size)
+        self.assertEqual(len(response.data[0]['authors']), len(self.members))
+        self.assertIsNotNone(response.data[0]['last_edited_by'])
+
+    def test_page_of_10_articles(self):
+        self.assert_list_query_count(10)
+
+    def test_page_of_100_articles(self):
+        self.assert_list_query_count(100)
+
+    def test_page_of_1000_articles(self):
+        self.assert_list_query_count(1000)
+
+    def test_article_version_list(self):
+        self.create_articles(4)
+        ArticleVersion.objects.update(stored_diff='[]', diff_status=ArticleVersion.DIFF_STATUS.READY)
+        representation_cache.clear()
+        # The page of versions, with the access of their articles
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/article_versions/')
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_article_version_list_with_line_diffs(self):
+        self.create_articles(4)
+        for version in ArticleVersion.objects.all():
+            ArticleVersion.objects.filter(pk=version.pk).update(
+                content='Line\n{member}\n'.format(member=version.created_by_id))
+        ArticleVersion.objects.update(stored_diff='[]', diff_status=ArticleVersion.DIFF_STATUS.READY)
+        representation_cache.clear()
+        comparison_cache.clear()
+        # The page of versions, and their previous versions
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/article_versions/?diff_mode=line&context=3')
+        comparison_cache.clear()
+        for representation in response.data['results']:
+            self.assertEqual(representation['diff'], ArticleVersion.objects.get(pk=representation['id']).diff(
+                'line', 3))
+        # The contents of the listed versions as well, when they are left out
+        representation_cache.clear()
+        comparison_cache.clear()
+        with self.assertNumQueries(3):
+            fieldset = self.client.get('/api/article_versions/?diff_mode=line&context=3&fields=id,diff')
+        self.assertEqual([representation['diff'] for representation in fieldset.data['results']],
+                         [representation['diff'] for representation in response.data['results']])
+
+    def test_category_list(self):
+        self.create_articles(10)
+        representation_cache.clear()
+        # The count, the page of categories and their articles
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/categories/')
+        self.assertEqual(len(response.data['results'][0]['articles']), 10)
+
+
+class ArticleCursorPaginationTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        for i in range(25):
+            Article.objects.create(title='Article {i}'.format(i=i), category=category, created_by=member)
+
+    def test_following_next_links_lists_all_articles_once(self):
+        ids = []
+        url = '/api/articles/'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [article['id'] for article in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, list(Article.objects.order_by('-updated_at').values_list('pk', flat=True)))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.superuser = Member.objects.create_superuser('admin', 'admin@example.com', 'password')
+        category = Category.objects.create(title='Category')
+        article = Article.objects.create(title='Article', category=category, created_by=self.superuser)
+        ArticleVersion.objects.create(content='Content', parent_article=article, created_by=self.superuser)
+
+    def test_export_streams_one_record_per_line(self):
+        self.client.login(username='admin', password='password')
+        response = self.client.get('/api/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['model'] for record in records],
+                         ['data_models.member', 'data_models.category', 'data_models.article',
+                          'data_models.articleversion'])
+        self.assertNotIn('password', records[0]['fields'])
+
+    def test_export_since_leaves_out_older_articles(self):
+        self.client.login(username='admin', password='password')
+        response = self.client.get('/api/export/', {'since': '2999-01-01T00:00:00Z'})
+        models = [json.loads(line)['model'] for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(models, ['data_models.member', 'data_models.category'])
+
+    def test_export_since_an_invalid_time(self):
+        self.client.login(username='admin', password='password')
+        for since in ('yesterday', '2016-13-01T00:00'):
+            response = self.client.get('/api/export/', {'since': since}, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_only_superusers_can_export(self):
+        self.assertEqual(self.client.get('/api/export/').status_code, 403)
+
+
+class ArticleSearchTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        Article.objects.create(title='Public radio', category=category, created_by=member)
+        Article.objects.create(title='Staff radio', category=category, created_by=member,
+                               access=Article.ACCESS.STAFF)
+
+    def test_search_only_returns_accessible_articles(self):
+        response = self.client.get('/api/articles/search/', {'q': 'radio'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([article['title'] for article in response.data], ['Public radio'])
+
+    def test_search_limit_is_at_least_one(self):
+        Article.objects.create(title='Other radio', category=Category.objects.get(),
+                               created_by=Member.objects.get())
+        response = self.client.get('/api/articles/search/', {'q': 'radio', 'limit': -1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+
+@override_settings(ARTICLE_VERSION_DIFFS={'BACKEND': 'data_models.diffs.QueueDiffBackend'})
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Article', category=category, created_by=self.member)
+        self.version = ArticleVersion.objects.create(content='Content', parent_article=self.article,
+                                                     created_by=self.member)
+
+    def test_article_with_matching_etag_is_not_modified(self):
+        url = '/api/articles/{id}/'.format(id=self.article.id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_new_version_changes_the_article_etag(self):
+        url = '/api/articles/{id}/'.format(id=self.article.id)
+        etag = self.client.get(url)['ETag']
+        ArticleVersion.objects.create(content='New content', parent_article=self.article, created_by=self.member)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_article_version_diff_mode_and_context(self):
+        version = ArticleVersion.objects.create(content='New content', parent_article=self.article,
+                                                created_by=self.member)
+        process_diff(self.version.id)
+        process_diff(version.id)
+        url = '/api/article_versions/{id}/'.format(id=version.id)
+        response = self.client.get(url + '?diff_mode=word&context=0')
+        self.assertEqual(response.data['diff'], [{'old_start': 1, 'new_start': 1, 'diff': [
+            {'type': -1, 'text': 'Content'}, {'type': 1, 'text': 'New content'}]}])
+        self.assertNotEqual(response['ETag'], self.client.get(url)['ETag'])
+        self.assertEqual(self.client.get(url + '?diff_mode=sentence').status_code, 400)
+
+    def test_compare_any_two_versions(self):
+        comparison_cache.clear()
+        middle = ArticleVersion.objects.create(content='Middle', parent_article=self.article, created_by=self.member)
+        last = ArticleVersion.objects.create(content='New content', parent_article=self.article,
+                                             created_by=self.member)
+        url = '/api/articles/{id}/compare/?from={old}&to={new}&diff_mode=word'.format(
+            id=self.article.id, old=self.version.id, new=last.id)
+        response = self.client.get(url)
+        self.assertEqual(response.data['diff'], [{'type': -1, 'text': 'Content'}, {'type': 1, 'text': 'New content'}])
+        # The article and the versions, but not their contents
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).data, response.data)
+
+        other = Article.objects.create(title='Other', category=self.article.category, created_by=self.member)
+        other_version = ArticleVersion.objects.create(content='Other', parent_article=other, created_by=self.member)
+        response = self.client.get('/api/articles/{id}/compare/?from={old}&to={new}'.format(
+            id=self.article.id, old=middle.id, new=other_version.id))
+        self.assertEqual(response.status_code, 400)
+
+    def test_article_not_modified_since_last_modified(self):
+        url = '/api/articles/{id}/'.format(id=self.article.id)
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT').status_code,
+                         200)
+
+    def test_article_version_is_revalidated_until_and_after_the_diff_is_ready(self):
+        url = '/api/article_versions/{id}/'.format(id=self.version.id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['diff'], response.data['diff_status']), (None, 'pending'))
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+        process_diff(self.version.id)
+        ready = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(ready.status_code, 200)
+        self.assertEqual((ready.data['diff'], ready.data['diff_status']), ([{'type': 1, 'text': 'Content'}], 'ready'))
+        self.assertEqual(ready['Cache-Control'], 'public, no-cache')
+
+    def test_rewritten_history_and_access_change_the_article_version_etag(self):
+        middle = ArticleVersion.objects.create(content='Content two', parent_article=self.article,
+                                               created_by=self.member)
+        last = ArticleVersion.objects.create(content='Content two three', parent_article=self.article,
+                                             created_by=self.member)
+        process_diff(last.id)
+        url = '/api/article_versions/{id}/'.format(id=last.id)
+        etag = self.client.get(url)['ETag']
+        middle.delete()
+        process_diff(last.id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['diff'], [{'type': 0, 'text': 'Content'}, {'type': 1, 'text': ' two three'}])
+
+        Member.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        etag = self.client.get(url)['ETag']
+        article = Article.objects.get(pk=self.article.pk)
+        article.access = Article.ACCESS.STAFF
+        article.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        representation_cache.clear()
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Article', category=category, created_by=self.member)
+        self.version = ArticleVersion.objects.create(content='Content', parent_article=self.article,
+                                                     created_by=self.member)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def test_content_is_not_read_unless_requested(self):
+        response, queries = self.get('/api/article_versions/?fields=id,created_at')
+        self.assertEqual(list(json.loads(response.content.decode())['results'][0]), ['id', 'created_at'])
+        self.assertFalse(any('"content"' in query for query in queries))
+
+        response, queries = self.get('/api/article_versions/?fields=id,content')
+        self.assertEqual(response.data['results'], [{'id': self.version.id, 'content': 'Content'}])
+        self.assertTrue(any('"content"' in query for query in queries))
+
+    def test_single_version_without_content(self):
+        response, queries = self.get('/api/article_versions/{id}/?fields=id,created_by'.format(id=self.version.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), ['id', 'created_by'])
+        self.assertFalse(any('"content"' in query for query in queries))
+
+    def test_fieldsets_are_cached_and_tagged_separately(self):
+        url = '/api/articles/{id}/'.format(id=self.article.id)
+        response = self.client.get(url + '?fields=title')
+        self.assertEqual(response.data, {'title': 'Article'})
+        full = self.client.get(url)
+        self.assertIn('versions', full.data)
+        self.assertNotEqual(full['ETag'], response['ETag'])
+        self.assertEqual(self.client.get(url + '?fields=title', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_empty_fieldset_uses_every_field(self):
+        full = self.client.get('/api/article_versions/')
+        for fields in ('', ',', ' '):
+            response = self.client.get('/api/article_versions/', {'fields': fields})
+            self.assertEqual(response.data['results'], full.data['results'])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/article_versions/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'fields': ['Unknown fields: secret']})
+
+
+class EditConflictTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com', 'password')
+        self.article = Article.objects.create(title='Article', category=Category.objects.create(title='Category'),
+                                              created_by=member)
+        self.base = ArticleVersion.objects.create(content='Base', parent_article=self.article, created_by=member)
+        self.client.login(username='member', password='password')
+
+    def edit(self, content, base_version=None):
+        data = {'content': content, 'parent_article': '/api/articles/{id}/'.format(id=self.article.id)}
+        if base_version is not None:
+            data['base_version'] = base_version
+        return self.client.post('/api/article_versions/', json.dumps(data), content_type='application/json')
+
+    def test_concurrent_edits_of_the_same_version(self):
+        first = self.edit('First edit', self.base.id)
+        self.assertEqual(first.status_code, 201)
+        second = self.edit('Second edit', self.base.id)
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.data['current_version'], first.data['id'])
+        self.assertEqual(Article.objects.get(pk=self.article.pk).current_version_id, first.data['id'])
+
+    def test_edits_without_base_version_are_not_checked(self):
+        self.assertEqual(self.edit('First edit').status_code, 201)
+        self.assertEqual(self.edit('Second edit').status_code, 201)
+
+
+@override_settings(MIDDLEWARE_CLASSES=['revoltwiki.instrumentation.InstrumentationMiddleware'] +
+                   settings.MIDDLEWARE_CLASSES)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com')
+        article = Article.objects.create(title='Article', category=Category.objects.create(title='Category'),
+                                         created_by=member)
+        ArticleVersion.objects.create(content='Content', parent_article=article, created_by=member)
+        recorder.clear()
+
+    def test_requests_are_recorded_per_endpoint(self):
+        self.client.get('/api/articles/')
+        query = 'query ArticleTitles { allArticles { edges { node { title } } } }'
+        self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        stats = recorder.stats()
+        self.assertEqual(list(stats), ['GET article-list', 'graphql query ArticleTitles'])
+        self.assertEqual(stats['GET article-list']['count'], 1)
+        # The page, the prefetched versions, and the authors and last editors of the articles
+        self.assertEqual(stats['GET article-list']['sql_count']['p50'], 4)
+        self.assertGreater(stats['graphql query ArticleTitles']['serialization_time']['max'], 0)
+
+    def test_queries_beyond_the_size_of_the_connection_log_are_counted(self):
+        with mock.patch.object(connection, 'queries_log', deque(maxlen=2)):
+            self.client.get('/api/articles/')
+            self.assertEqual(len(connection.queries_log), 2)
+        self.assertEqual(recorder.stats()['GET article-list']['sql_count']['p50'], 4)
+
+    @override_settings(INSTRUMENTATION_MAX_TAGS=2)
+    def test_operations_beyond_the_maximum_are_recorded_together(self):
+        for name in ('First', 'Second', 'Third', 'Fourth'):
+            query = 'query %s { allArticles { edges { node { title } } } }' % name
+            self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        stats = recorder.stats()
+        self.assertEqual(list(stats), ['<other>', 'graphql query First', 'graphql query Second'])
+        self.assertEqual(stats['<other>']['count'], 2)
+
+    def test_only_superusers_can_view_the_percentiles(self):
+        self.assertEqual(self.client.get('/api/instrumentation/').status_code, 403)
+        Member.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.client.get('/api/articles/')
+        response = self.client.get('/api/instrumentation/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['GET article-list']),
+                         {'count', 'wall_time', 'sql_time', 'sql_count', 'serialization_time'})
+        self.assertEqual(set(response.data['GET article-list']['wall_time']), {'p50', 'p90', 'p99', 'max'})
+
+    @override_settings(INSTRUMENTATION_SLOW_REQUEST_TIME=0)
+    def test_slow_requests_are_logged_with_their_queries(self):
+        with self.assertLogs('revoltwiki.instrumentation', 'WARNING') as logs:
+            self.client.get('/api/articles/')
+        self.assertIn('Slow request GET /api/articles/ (GET article-list)', logs.output[0])
+        self.assertIn('FROM "data_models_article"', logs.output[0])
+
+    def test_queries_differing_in_parameters_have_the_same_fingerprint(self):
+        self.assertEqual(fingerprint("SELECT * FROM a WHERE id IN (1, 2, 3) AND title = 'It''s'"),
+                         fingerprint("SELECT * FROM a WHERE id IN (4) AND title = 'Other'"))
+
+
+class RepresentationCacheTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        self.category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Article', category=self.category, created_by=self.member)
+        ArticleVersion.objects.create(content='Content', parent_article=self.article, created_by=self.member)
+
+    def test_repeated_list_is_served_from_the_cache(self):
+        self.client.get('/api/articles/')
+        hits = representation_cache.hits
+        # Only the page and the prefetched versions are queried, not the authors
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/articles/')
+        self.assertEqual(representation_cache.hits, hits + 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Article')
+
+    def test_new_version_invalidates_the_article(self):
+        url = '/api/articles/{id}/'.format(id=self.article.id)
+        self.assertEqual(len(self.client.get(url).data['versions']), 1)
+        ArticleVersion.objects.create(content='New content', parent_article=self.article, created_by=self.member)
+        self.assertEqual(len(self.client.get(url).data['versions']), 2)
+
+    def test_moving_an_article_invalidates_both_categories(self):
+        other_category = Category.objects.create(title='Other category')
+        urls = ['/api/categories/{id}/'.format(id=category.id) for category in (self.category, other_category)]
+        self.assertEqual([len(self.client.get(url).data['articles']) for url in urls], [1, 0])
+        article = Article.objects.get(pk=self.article.pk)
+        article.category = other_category
+        article.save()
+        self.assertEqual([len(self.client.get(url).data['articles']) for url in urls], [0, 1])
+
+    def test_changed_access_invalidates_the_versions(self):
+        Member.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        version = self.article.current_version
+        url = '/api/article_versions/{id}/'.format(id=version.id)
+        self.assertEqual(self.client.get(url).data['access'], Article.ACCESS.ALL)
+        article = Article.objects.get(pk=self.article.pk)
+        article.access = Article.ACCESS.STAFF
+        article.save()
+        self.assertEqual(self.client.get(url).data['access'], Article.ACCESS.STAFF)
+
+    def test_only_superusers_can_view_the_statistics(self):
+        self.assertEqual(self.client.get('/api/cache/').status_code, 403)
+        Member.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        response = self.client.get('/api/cache/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'backend', 'entries', 'hits', 'misses'})
+
+
+class RepresentationCacheCommitTests(TransactionTestCase):
+    def test_representations_cached_before_the_commit_are_invalidated(self):
+        member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        article = Article.objects.create(title='Article', category=category, created_by=member)
+        with transaction.atomic():
+            article.title = 'New title'
+            article.save()
+            # Another request reads the old state and caches it before the change is committed
+            representation_cache.set('article', article.pk, 'variant', {'title': 'Article'})
+            self.assertIsNotNone(representation_cache.get('article', article.pk, 'variant'))
+        self.assertIsNone(representation_cache.get('article', article.pk, 'variant'))
+
+
+class AccessTests(TestCase):
+    """
+    Every role should see exactly the articles and versions its access allows
+    """
+
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com', 'password')
+        Member.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        Member.objects.create_superuser('admin', 'admin@example.com', 'password')
+        category = Category.objects.create(title='Category')
+        for access, title in Article.ACCESS_CHOICES:
+            article = Article.objects.create(title=str(title), category=category, created_by=member, access=access)
+            ArticleVersion.objects.create(content='Content', parent_article=article, created_by=member)
+
+    def assert_accessible(self, username, titles):
+        if username is not None:
+            self.client.login(username=username, password='password')
+        articles = self.client.get('/api/articles/').data['results']
+        self.assertEqual(sorted(article['title'] for article in articles), sorted(titles))
+        article_versions = self.client.get('/api/article_versions/').data['results']
+        self.assertEqual(len(article_versions), len(titles))
+        # Neither do categories and contributions link to articles and versions the user cannot access
+        category = self.client.get('/api/categories/{id}/'.format(id=Category.objects.get(title='Category').id))
+        self.assertEqual(len(category.data['articles']), len(titles))
+        member = Member.objects.get(username='member')
+        members = [data for data in self.client.get('/api/members/').data['results'] if data['id'] == member.id]
+        members.append(self.client.get('/api/members/{id}/'.format(id=member.id)).data)
+        for data in members:
+            self.assertEqual(len(data['contributions_by_article']), len(titles))
+            self.assertEqual(len(data['contributions_by_version']), len(titles))
+
+    def test_anonymous_user(self):
+        self.assert_accessible(None, ['All'])
+
+    def test_member(self):
+        self.assert_accessible('member', ['All'])
+
+    def test_staff(self):
+        self.assert_accessible('staff', ['All', 'Staff', 'Staff or superuser'])
+
+    def test_superuser(self):
+        self.assert_accessible('admin', ['All', 'Staff', 'Superuser', 'Staff or superuser'])
+
+    def test_staff_can_retrieve_staff_articles(self):
+        self.client.login(username='staff', password='password')
+        article = Article.objects.get(access=Article.ACCESS.STAFF)
+        self.assertEqual(self.client.get('/api/articles/{id}/'.format(id=article.id)).status_code, 200)
+        article = Article.objects.get(access=Article.ACCESS.SUPERUSER)
+        self.assertEqual(self.client.get('/api/articles/{id}/'.format(id=article.id)).status_code, 404)
+
+    def test_article_by_slug(self):
+        # One lookup by the unique slug, then the versions and the authors of the article
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/articles/by-slug/all/')
+        self.assertEqual(response.data['title'], 'All')
+        self.assertEqual(response.data['slug'], 'all')
+        self.assertEqual(self.client.get('/api/articles/by-slug/staff/').status_code, 404)
+        self.assertEqual(self.client.get('/api/articles/by-slug/missing/').status_code, 404)
@@ -4,7 +4,8 @@ from rest_framework import routers
 from rest_framework_jwt.views import obtain_jwt_token
 from rest_framework_jwt.views import refresh_jwt_token
 
-from .views import MemberViewSet, CategoryViewSet, ArticleViewSet, ArticleVersionViewSet
+from .views import MemberViewSet, CategoryViewSet, ArticleViewSet, ArticleVersionViewSet, ExportView, \
+    RepresentationCacheView, InstrumentationView
 
 rest_router = routers.DefaultRouter()
 rest_router.register(r'members', MemberViewSet)
@@ -13,7 +14,12 @@ rest_router.register(r'article_versions', ArticleVersionViewSet)
 rest_router.register(r'categories', CategoryViewSet)
 
 urlpatterns = [
+    url(r'^articles/by-slug/(?P<slug>[^/]+)/$', ArticleViewSet.as_view({'get': 'retrieve'}, lookup_field='slug'),
+        name='article-by-slug'),
     url(r'^', include(rest_router.urls)),
+    url(r'^export/$', ExportView.as_view(), name='export'),
+    url(r'^cache/$', RepresentationCacheView.as_view(), name='cache'),
+    url(r'^instrumentation/$', InstrumentationView.as_view(), name='instrumentation'),
     url(r'^auth/', include('rest_framework.urls', namespace='rest_framework')),
     url(r'^token-auth/', obtain_jwt_token),
     url(r'^token-refresh/', refresh_jwt_token),
@@ -1,13 +1,70 @@
-from django.db.models import Q
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 
 from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import detail_route, list_route
+from rest_framework.filters import OrderingFilter
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.serializers import ValidationError
 
-from data_models.models import Article, ArticleVersion, Category, Member
+from data_models import diffs
+from data_models.cache import representation_cache
+from data_models.export import export_ndjson
+from data_models.models import Article, ArticleVersion, Category, EditConflict, Member
+from data_models.search import search_articles
+from revoltwiki.instrumentation import recorder
 
 from .serializers import MemberSerializer, ArticleSerializer, ArticleVersionSerializer, CategorySerializer
-from .permissions import MemberPermissions, CategoryPermissions, ArticlePermissions, ArticleVersionPermissions
+from .permissions import MemberPermissions, CategoryPermissions, ArticlePermissions, ArticleVersionPermissions, \
+    ExportPermissions, StatisticsPermissions
+from .renderers import NDJSONRenderer
+from .conditional import ConditionalRetrieveMixin
+from .fieldsets import SparseFieldsetMixin
+from .pagination import ArticleCursorPagination, ArticleVersionCursorPagination, MemberCursorPagination
+
+
+def get_allowed_access(request):
+    """
+    Returns the access bitmask of the user of the request, computed once per request
+    """
+    try:
+        return request.allowed_access
+    except AttributeError:
+        request.allowed_access = Article.allowed_access(request.user)
+        return request.allowed_access
+
+
+class EditConflictError(ValidationError):
+    status_code = status.HTTP_409_CONFLICT
+
+
+def get_diff_options(request):
+    """
+    Returns the diff mode and the number of context lines, if any, asked for with '?diff_mode=' and '?context='
+    """
+    mode = request.query_params.get('diff_mode', diffs.CHAR)
+    if mode not in diffs.MODES:
+        raise ValidationError({'diff_mode': ['Must be one of {modes}'.format(modes=', '.join(diffs.MODES))]})
+    context = request.query_params.get('context')
+    if context is not None:
+        try:
+            context = int(context)
+        except ValueError:
+            context = -1
+        if context < 0:
+            raise ValidationError({'context': ['Must be a number of lines']})
+    return {'mode': mode, 'context': context}
+
+
+def get_version_id(request, param):
+    try:
+        return int(request.query_params[param])
+    except (KeyError, ValueError):
+        raise ValidationError({param: ['Must be the id of a version of the article']})
 
 
 class MemberViewSet(mixins.CreateModelMixin,
@@ -21,24 +78,84 @@ class MemberViewSet(mixins.CreateModelMixin,
     queryset = Member.objects.all().order_by('-date_joined')
     serializer_class = MemberSerializer
     permission_classes = [MemberPermissions]
+    pagination_class = MemberCursorPagination
+
+    # Only the versions of the articles the user can access are listed as contributions
+    def get_queryset(self):
+        return self.queryset.prefetch_related(Prefetch(
+            'contributions_by_version',
+            queryset=ArticleVersion.objects.accessible(get_allowed_access(self.request)).only('id', 'created_by')
+        ))
 
 
-class ArticleViewSet(mixins.CreateModelMixin,
+class ArticleViewSet(SparseFieldsetMixin,
+                     ConditionalRetrieveMixin,
+                     mixins.CreateModelMixin,
                      mixins.RetrieveModelMixin,
                      mixins.UpdateModelMixin,
                      mixins.ListModelMixin,
                      GenericViewSet):
     """
     API endpoint that allows articles to be viewed, created or edited.
+    Use '?ordering=-last_edited_at' to list the most recently edited articles first,
+    and '?fields=<name>,<name>' to only get some of the fields.
+    Two versions of an article are compared at '/api/articles/<id>/compare/?from=<id>&to=<id>',
+    and an article is found by its slug at '/api/articles/by-slug/<slug>/'.
     """
     serializer_class = ArticleSerializer
     permission_classes = [ArticlePermissions]
+    pagination_class = ArticleCursorPagination
     queryset = Article.objects.all().order_by('-updated_at')
+    filter_backends = [OrderingFilter]
+    ordering_fields = ('updated_at', 'last_edited_at')
+    ordering = '-updated_at'
+
+    SEARCH_LIMIT = 20
+    MAX_SEARCH_LIMIT = 100
 
     # Sets 'created_by' to the current user and that the 'current_version' is null
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user, current_version=None)
 
+    # Every change to an article, including a new current version, updates 'updated_at'
+    def get_etag_key(self, article):
+        return 'article:{id}:{updated_at}'.format(id=article.id, updated_at=article.updated_at.isoformat())
+
+    def get_last_modified(self, article):
+        return article.updated_at
+
+    # Full-text search over the title and current content, using '?q=<words>' and optionally '&limit=<count>'
+    @list_route()
+    def search(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', self.SEARCH_LIMIT)), self.MAX_SEARCH_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': ['Must be a number']})
+        articles = search_articles(request.query_params.get('q', ''), self.get_queryset(), limit)
+        serializer = self.get_serializer(articles, many=True)
+        return Response(serializer.data)
+
+    # The diff between two versions of the article, using '?from=<id>&to=<id>', and optionally '&diff_mode=<mode>'
+    # and '&context=<lines>' like for article versions
+    @detail_route()
+    def compare(self, request, pk=None):
+        article = self.get_object()
+        from_id = get_version_id(request, 'from')
+        to_id = get_version_id(request, 'to')
+        # The contents are only loaded if the comparison is not cached
+        versions = article.versions.defer('content', 'stored_diff').in_bulk([from_id, to_id])
+        for param, version_id in (('from', from_id), ('to', to_id)):
+            if version_id not in versions:
+                raise ValidationError({param: ['Must be the id of a version of the article']})
+        diff_options = get_diff_options(request)
+        return Response({
+            'from': from_id,
+            'to': to_id,
+            'diff_mode': diff_options['mode'],
+            'context': diff_options['context'],
+            'diff': diffs.compare_versions(versions[from_id], versions[to_id], **diff_options),
+        })
+
     # Ensures that the 'current_version' belongs to this article (a little hackish)
     def perform_update(self, serializer):
         try:
@@ -46,54 +163,80 @@ class ArticleViewSet(mixins.CreateModelMixin,
         except AttributeError as error:
             raise ValidationError({'current_version': [str(error)]})
 
+    # Fetches everything the serializer needs with a constant number of queries, regardless of page size
     def get_queryset(self):
-        if self.request.user.is_authenticated():
+        fieldset = self.get_fieldset()
+        if self.action == 'compare' or fieldset is not None and 'versions' not in fieldset:
+            return self.get_accessible_queryset()
+        return self.get_accessible_queryset().prefetch_related(
+            Prefetch('versions', queryset=ArticleVersion.objects.only('id', 'parent_article'))
+        )
 
-            # Superusers
-            if self.request.user.is_superuser:
-                return Article.objects.all().order_by('-updated_at')
+    def get_accessible_queryset(self):
+        return Article.objects.accessible(get_allowed_access(self.request)).order_by('-updated_at')
 
-            # Staff
-            if self.request.user.is_superuser:
-                return Article.objects.get(
-                    Q(access=Article.ACCESS.ALL) |
-                    Q(access=Article.ACCESS.STAFF)
-                ).order_by('-updated_at')
 
-        return Article.objects.filter(access=Article.ACCESS.ALL).order_by('-updated_at')
-
-
-class ArticleVersionViewSet(mixins.CreateModelMixin,
+class ArticleVersionViewSet(SparseFieldsetMixin,
+                            ConditionalRetrieveMixin,
+                            mixins.CreateModelMixin,
                             mixins.RetrieveModelMixin,
                             mixins.ListModelMixin,
                             GenericViewSet):
     """
     API endpoint that allows article versions to be viewed or created.
+    Use '?fields=<name>,<name>' to only get some of the fields, like '?fields=id,url,created_at' for metadata only.
+    Use '?diff_mode=word' or '?diff_mode=line' for a coarser diff than by character, and '?context=<lines>'
+    to only get the changed hunks of the diff with that many unchanged lines around them.
     """
     queryset = ArticleVersion.objects.all().order_by('-created_at')
     serializer_class = ArticleVersionSerializer
     permission_classes = [ArticleVersionPermissions]
+    pagination_class = ArticleVersionCursorPagination
+    deferred_fields = {
+        'content': ('content',),
+        'diff': ('stored_diff',),
+    }
+
+    # The diff of a version changes when history before it is rewritten, which bumps diff_generation, and the
+    # access of the version is that of its article, so clients always have to revalidate
+    def get_etag_key(self, article_version):
+        return 'article_version:{id}:{generation}:{diff_status}:{access}:{mode}:{context}'.format(
+            id=article_version.id, generation=article_version.diff_generation,
+            diff_status=article_version.diff_status, access=article_version.access(),
+            **get_diff_options(self.request))
+
+    # Rewriting history and changing the access both update the article
+    def get_last_modified(self, article_version):
+        return max(article_version.created_at, article_version.parent_article.updated_at)
+
+    def get_cache_control(self, article_version):
+        visibility = 'public' if article_version.access() == Article.ACCESS.ALL else 'private'
+        return '{visibility}, no-cache'.format(visibility=visibility)
 
     # Override the default create-method to force 'created_by' to be the current user
     # Sets 'created_by' to the current user and that the 'current_version' is null
+    # With 'base_version', the edit is refused with 409 Conflict if the article has got a newer version since
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
-
-    def get_queryset(self):
-        if self.request.user.is_authenticated():
-
-            # Superusers
-            if self.request.user.is_superuser:
-                return ArticleVersion.objects.all().order_by('-created_at')
+        try:
+            serializer.save(created_by=self.request.user)
+        except EditConflict as conflict:
+            raise EditConflictError({
+                'base_version': ['The article has a newer version than the one the edit is based on'],
+                'current_version': conflict.current_version_id,
+            })
 
-            # Staff
-            if self.request.user.is_superuser:
-                return ArticleVersion.objects.get(
-                    Q(parent_article__access=Article.ACCESS.ALL) |
-                    Q(parent_article__access=Article.ACCESS.STAFF)
-                ).order_by('-created_at')
+    def get_serializer_context(self):
+        context = super(ArticleVersionViewSet, self).get_serializer_context()
+        diff_options = get_diff_options(self.request)
+        context.update(diff_mode=diff_options['mode'], diff_context=diff_options['context'])
+        return context
 
-        return ArticleVersion.objects.filter(parent_article__access=Article.ACCESS.ALL).order_by('-created_at')
+    # The access of a version is that of its article
+    def get_queryset(self):
+        return self.defer_unrequested(
+            ArticleVersion.objects.accessible(get_allowed_access(self.request)).select_related('parent_article')
+            .order_by('-created_at')
+        )
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -103,3 +246,53 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all().order_by('-title')
     serializer_class = CategorySerializer
     permission_classes = [CategoryPermissions]
+
+    # Only the articles the user can access are listed. The hyperlinks are made with the title of the article.
+    def get_queryset(self):
+        return self.queryset.prefetch_related(Prefetch(
+            'articles',
+            queryset=Article.objects.accessible(get_allowed_access(self.request)).only('id', 'title', 'category')
+        ))
+
+
+class ExportView(APIView):
+    """
+    API endpoint that streams all members, categories, articles and article versions as newline delimited JSON.
+    Use '?since=<ISO 8601 time>' to only export articles updated and versions created since then.
+    """
+    permission_classes = [ExportPermissions]
+    renderer_classes = [NDJSONRenderer, JSONRenderer]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is not None:
+            # Well-formed times that do not exist, like month 13, raise ValueError
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                raise ValidationError({'since': ['Must be an ISO 8601 date and time']})
+        return StreamingHttpResponse(export_ndjson(since), content_type=NDJSONRenderer.media_type)
+
+
+class RepresentationCacheView(APIView):
+    """
+    API endpoint that shows the hits and misses of the cache of article, article version and category
+    representations in this process.
+    """
+    permission_classes = [StatisticsPermissions]
+
+    def get(self, request):
+        return Response(representation_cache.stats())
+
+
+class InstrumentationView(APIView):
+    """
+    API endpoint that shows percentiles of the query count, SQL time, serialization time and wall time of the latest
+    requests to each endpoint in this process, recorded by revoltwiki.instrumentation.InstrumentationMiddleware.
+    """
+    permission_classes = [StatisticsPermissions]
+
+    def get(self, request):
+        return Response(recorder.stats())
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class LRUCacheBackend(object):
+    """
+    Keeps the most recently used representations in the memory of the process
+
+    Every process has its own cache, so a write in one process only invalidates the cache of that process.
+    Use DjangoCacheBackend with a shared cache when running several processes.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.keys_by_object = {}
+        self.lock = threading.Lock()
+
+    def get(self, obj, variant):
+        with self.lock:
+            key = (obj, variant)
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, obj, variant, data):
+        with self.lock:
+            key = (obj, variant)
+            self.entries[key] = data
+            self.entries.move_to_end(key)
+            self.keys_by_object.setdefault(obj, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                (evicted_obj, evicted_variant), _ = self.entries.popitem(last=False)
+                self.forget(evicted_obj, (evicted_obj, evicted_variant))
+
+    def forget(self, obj, key):
+        keys = self.keys_by_object.get(obj)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_object[obj]
+
+    def invalidate(self, obj):
+        with self.lock:
+            for key in self.keys_by_object.pop(obj, ()):
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_object.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DjangoCacheBackend(object):
+    """
+    Keeps the representations in one of the caches configured in CACHES
+
+    Invalidation bumps a generation number per object, which is part of the keys of its representations.
+    Missing generations start from the current time, so an evicted generation never revives old entries.
+    """
+
+    def __init__(self, cache='default', timeout=None, key_prefix='representation'):
+        self.cache = caches[cache]
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def generation_key(self, obj):
+        return '{prefix}:{kind}:{pk}'.format(prefix=self.key_prefix, kind=obj[0], pk=obj[1])
+
+    def key(self, obj, variant):
+        generation_key = self.generation_key(obj)
+        generation = self.cache.get(generation_key)
+        if generation is None:
+            generation = int(time.time() * 1000000)
+            self.cache.add(generation_key, generation, None)
+            generation = self.cache.get(generation_key, generation)
+        return '{generation_key}:{generation}:{variant}'.format(generation_key=generation_key,
+                                                               generation=generation, variant=variant)
+
+    def get(self, obj, variant):
+        return self.cache.get(self.key(obj, variant))
+
+    def set(self, obj, variant, data):
+        self.cache.set(self.key(obj, variant), data, self.timeout)
+
+    def invalidate(self, obj):
+        try:
+            self.cache.incr(self.generation_key(obj))
+        except ValueError:
+            pass
+
+    def clear(self):
+        self.cache.clear()
+
+    def __len__(self):
+        return 0
+
+
+class RepresentationCache(object):
+    """
+    Cache of the serialized representations of articles, article versions and categories
+
+    Representations are stored per object, identified by kind and primary key, and per variant, which holds
+    everything else the representation depends on (like the access level of the viewer). The models invalidate
+    the objects they change. The backend is configured by the given setting.
+    """
+
+    def __init__(self, setting='REPRESENTATION_CACHE'):
+        self.setting = setting
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            config = getattr(settings, self.setting, {})
+            backend = import_string(config.get('BACKEND', 'data_models.cache.LRUCacheBackend'))
+            self._backend = backend(**config.get('OPTIONS', {}))
+        return self._backend
+
+    def get(self, kind, pk, variant):
+        data = self.backend.get((kind, pk), variant)
+        with self.lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, kind, pk, variant, data):
+        self.backend.set((kind, pk), variant, data)
+
+    def invalidate(self, kind, *pks):
+        """
+        Invalidates the representations of the given objects now, and again when the transaction is committed
+
+        Until then, other requests still read the old state and may cache it again.
+        """
+        objects = [(kind, pk) for pk in pks if pk is not None]
+        self.invalidate_objects(objects)
+        if objects and transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self.invalidate_objects(objects))
+
+    def invalidate_objects(self, objects):
+        for obj in objects:
+            self.backend.invalidate(obj)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': hits,
+            'misses': misses,
+        }
+
+
+representation_cache = RepresentationCache()
+# Diffs between pairs of article versions (see diffs.compare_versions()), and word and line diffs of article versions
+# against the previous one (see ArticleVersion.diff())
+comparison_cache = RepresentationCache('COMPARISON_CACHE')
@@ -0,0 +1,237 @@
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from diff_match_patch import diff_match_patch
+
+from .cache import comparison_cache
+
+
+logger = logging.getLogger(__name__)
+
+# The granularities of diffs. Character diffs are cleaned up to be readable, word and line diffs never split
+# words or lines.
+CHAR = 'char'
+WORD = 'word'
+LINE = 'line'
+MODES = (CHAR, WORD, LINE)
+
+WORD_PATTERN = re.compile(r'\w+|\s+|[^\w\s]')
+LINE_PATTERN = re.compile(r'[^\n]*\n|[^\n]+')
+
+
+def diff_timeout():
+    """
+    Returns the number of seconds diff_match_patch may spend on one diff before settling for a coarser one
+    """
+    return getattr(settings, 'ARTICLE_VERSION_DIFF_TIMEOUT', 1.0)
+
+
+def compute_diff(old, new, mode=CHAR, timeout=None):
+    """
+    Returns the diff from old to new as a list of [type, text], where type is -1 (removed), 0 (kept) or 1 (added)
+    """
+    dmp = diff_match_patch()
+    dmp.Diff_Timeout = diff_timeout() if timeout is None else timeout
+    if mode == CHAR:
+        diff = dmp.diff_main(old, new)
+        dmp.diff_cleanupSemantic(diff)
+    elif mode == LINE:
+        old_chars, new_chars, lines = dmp.diff_linesToChars(old, new)
+        diff = dmp.diff_main(old_chars, new_chars, False)
+        dmp.diff_charsToLines(diff, lines)
+    elif mode == WORD:
+        old_chars, new_chars, words = words_to_chars(old, new)
+        diff = dmp.diff_main(old_chars, new_chars, False)
+        dmp.diff_charsToLines(diff, words)
+    else:
+        raise ValueError('Unknown diff mode {mode!r}'.format(mode=mode))
+    return [[t, txt] for (t, txt) in diff]
+
+
+def compare_versions(old, new, mode=CHAR, context=None):
+    """
+    Returns the diff from one article version to another, as segments or as hunks with context lines
+
+    Version contents never change unless history is rewritten, which clears the cache, so the diffs are cached
+    by the pair of version ids. The contents are only read on a cache miss.
+    """
+    pair = '{old}-{new}'.format(old=old.pk, new=new.pk)
+    variant = '{mode}:{context}'.format(mode=mode, context=context)
+    comparison = comparison_cache.get('comparison', pair, variant)
+    if comparison is None:
+        diff = compute_diff(old.content, new.content, mode)
+        comparison = segments(diff) if context is None else context_hunks(diff, context)
+        comparison_cache.set('comparison', pair, variant, comparison)
+    return comparison
+
+
+def words_to_chars(old, new):
+    """
+    Like diff_linesToChars() in diff_match_patch, but with words, runs of whitespace and single punctuation marks
+    """
+    words = ['']
+    indexes = {}
+
+    def encode(text):
+        chars = []
+        for word in WORD_PATTERN.findall(text):
+            if word not in indexes:
+                indexes[word] = len(words)
+                words.append(word)
+            chars.append(chr(indexes[word]))
+        return ''.join(chars)
+
+    return encode(old), encode(new), words
+
+
+def segments(diff):
+    return [{'type': t, 'text': txt} for (t, txt) in diff]
+
+
+def context_hunks(diff, context=3):
+    """
+    Returns the changes of a diff grouped in hunks, with up to context unchanged lines around them
+
+    Each hunk has the line numbers where it starts in the old and the new text, and its part of the diff.
+    """
+    hunks = []
+    hunk = None
+    old_line = new_line = 1
+    at_line_start = True
+    for index, (t, txt) in enumerate(diff):
+        if t != 0:
+            if hunk is None:
+                hunk = {'old_start': old_line, 'new_start': new_line, 'diff': []}
+                hunks.append(hunk)
+            hunk['diff'].append({'type': t, 'text': txt})
+        else:
+            head = leading_lines(txt, context, at_line_start) if hunk is not None else ''
+            tail = trailing_lines(txt, context) if index < len(diff) - 1 else ''
+            if hunk is not None and len(head) + len(tail) >= len(txt):
+                hunk['diff'].append({'type': 0, 'text': txt})
+            else:
+                if head:
+                    hunk['diff'].append({'type': 0, 'text': head})
+                hunk = None
+                if tail:
+                    skipped = txt[:len(txt) - len(tail)].count('\n')
+                    hunk = {'old_start': old_line + skipped, 'new_start': new_line + skipped,
+                            'diff': [{'type': 0, 'text': tail}]}
+                    hunks.append(hunk)
+        if t <= 0:
+            old_line += txt.count('\n')
+        if t >= 0:
+            new_line += txt.count('\n')
+        if txt:
+            at_line_start = txt.endswith('\n')
+    return hunks
+
+
+def leading_lines(text, count, at_line_start):
+    """
+    Returns the rest of the current line of the text, unless it starts a line, and the count lines after it
+    """
+    lines = LINE_PATTERN.findall(text)
+    return ''.join(lines[:count if at_line_start else count + 1])
+
+
+def trailing_lines(text, count):
+    """
+    Returns the count lines before the last line of the text, and the last line unless the text ends with a newline
+    """
+    lines = LINE_PATTERN.findall(text)
+    count = count if text.endswith('\n') else count + 1
+    return ''.join(lines[-count:]) if count else ''
+
+
+def process_diff(article_version_id, timeout=None):
+    """
+    Computes and stores the diff of an article version unless it is ready, and marks it as failed on errors
+
+    Returns True if the diff was stored and False if computing it failed. Returns None if it was skipped, since it was
+    ready or the version is gone, or if the diff was invalidated while it was computed, since the invalidation
+    enqueues the version again.
+    """
+    from .models import ArticleVersion
+
+    article_version = ArticleVersion.objects.exclude(diff_status=ArticleVersion.DIFF_STATUS.READY).filter(
+        pk=article_version_id).first()
+    if article_version is None:
+        return None
+    try:
+        return article_version.store_diff(timeout) or None
+    except Exception:
+        logger.exception('Computing the diff of article version %s failed', article_version_id)
+        ArticleVersion.objects.filter(pk=article_version_id, diff_generation=article_version.diff_generation).update(
+            diff_status=ArticleVersion.DIFF_STATUS.FAILED)
+        return False
+
+
+class ImmediateDiffBackend(object):
+    """
+    Computes diffs right away, in the request that saves the article version
+    """
+
+    def enqueue(self, article_version):
+        article_version.store_diff()
+
+
+class ThreadPoolDiffBackend(object):
+    """
+    Computes diffs in a pool of threads in the web process, once the transaction saving the version is committed
+
+    Diffs that are pending when the process stops are left for 'python manage.py compute_diffs', or enqueued again
+    when they are read. A version is only queued once until its diff is started, which reads its diff_generation.
+    """
+
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.queued = set()
+        self.lock = threading.Lock()
+
+    def enqueue(self, article_version):
+        article_version_id = article_version.pk
+        transaction.on_commit(lambda: self.submit(article_version_id))
+
+    def submit(self, article_version_id):
+        with self.lock:
+            if article_version_id in self.queued:
+                return
+            self.queued.add(article_version_id)
+        self.executor.submit(self.run, article_version_id)
+
+    def run(self, article_version_id):
+        with self.lock:
+            self.queued.discard(article_version_id)
+        try:
+            process_diff(article_version_id)
+        finally:
+            connection.close()
+
+
+class QueueDiffBackend(object):
+    """
+    Leaves the diffs pending in the database, for 'python manage.py compute_diffs --watch' to compute
+    """
+
+    def enqueue(self, article_version):
+        pass
+
+
+_backends = {}
+
+
+def get_diff_backend():
+    config = getattr(settings, 'ARTICLE_VERSION_DIFFS', {})
+    path = config.get('BACKEND', 'data_models.diffs.ImmediateDiffBackend')
+    options = config.get('OPTIONS', {})
+    key = (path, tuple(sorted(options.items())))
+    if key not in _backends:
+        _backends[key] = import_string(path)(**options)
+    return _backends[key]
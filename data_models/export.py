@@ -0,0 +1,78 @@
+import datetime
+import json
+
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Article, ArticleVersion, Category, Member
+
+
+CHUNK_SIZE = 1000
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """
+    Keeps the microseconds of times, which DjangoJSONEncoder truncates, since versions are ordered by them
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super(ExportJSONEncoder, self).default(o)
+
+
+def queryset_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields a queryset in primary key order as lists of at most chunk_size objects, so memory use stays constant
+    """
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+# The serializers select relations by name, but other fields by attribute name (see VersionContentField)
+def local_field_names(model, exclude=()):
+    return [field.name if field.remote_field else field.attname
+            for field in model._meta.local_fields if field.name not in exclude]
+
+
+def export_records(since=None, include_passwords=False, chunk_size=CHUNK_SIZE):
+    """
+    Yields every member, category, article and article version in the same form as dumpdata
+
+    With 'since', only articles updated and article versions created at or after that time are included.
+    """
+    articles = Article.objects.all()
+    article_versions = ArticleVersion.objects.all()
+    if since is not None:
+        articles = articles.filter(updated_at__gte=since)
+        article_versions = article_versions.filter(created_at__gte=since)
+
+    # Stored diffs are left out, since they can be recomputed from the content, which is always exported in full.
+    # So is their status, which makes the imported versions pending.
+    querysets = (
+        (Member.objects.all(), local_field_names(Member, exclude=() if include_passwords else ('password',))),
+        (Category.objects.all(), local_field_names(Category)),
+        (articles, local_field_names(Article)),
+        (article_versions, local_field_names(ArticleVersion, exclude=('stored_diff', 'diff_status', 'diff_generation',
+                                                                       'delta_base'))),
+    )
+    for queryset, fields in querysets:
+        for chunk in queryset_chunks(queryset, chunk_size):
+            for record in serializers.serialize('python', chunk, fields=fields):
+                yield record
+
+
+def export_ndjson(since=None, include_passwords=False, chunk_size=CHUNK_SIZE):
+    """
+    Yields the exported records as newline delimited JSON
+    """
+    for record in export_records(since, include_passwords, chunk_size):
+        yield json.dumps(record, cls=ExportJSONEncoder) + '\n'
@@ -0,0 +1,166 @@
+import json
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import connection, models, transaction
+from django.db.models import Case, When, Value
+
+from .cache import representation_cache
+from .models import Article, ArticleVersion, Category, Member
+from .search import get_search_backend
+
+
+BATCH_SIZE = 1000
+
+# Articles are imported without their current version, so that every batch only refers to rows already imported,
+# given that the models of a pass are imported in order
+PASSES = (
+    (Member, Category, Article),
+    (ArticleVersion,),
+)
+
+
+def read_records(path):
+    """
+    Yields the records of a newline delimited JSON export, or of a JSON array like the output of dumpdata
+
+    Newline delimited JSON is read one line at a time, while a JSON array has to be read into memory.
+    """
+    with open(path) as input_file:
+        first = input_file.read(1)
+        while first.isspace():
+            first = input_file.read(1)
+        if first == '[':
+            for record in json.loads(first + input_file.read()):
+                yield record
+            return
+        yield json.loads(first + input_file.readline())
+        for line in input_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+@contextmanager
+def imported_timestamps():
+    """
+    Keeps the imported created_at and updated_at values instead of setting them to the current time
+    """
+    fields = [field for model in (Member, Category, Article, ArticleVersion) for field in model._meta.local_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer(object):
+    """
+    Imports records in batches with bulk_create, one transaction per batch
+
+    Rows whose primary key already exists are skipped. The current versions of the articles are set in a
+    separate pass once all versions have been imported, after which the edit statistics are recomputed, the search
+    index is rebuilt and the representation cache is cleared.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.created = {}
+        self.skipped = {}
+        self.current_versions = {}
+        self.started_at = None
+
+    @property
+    def rows(self):
+        return sum(self.created.values()) + sum(self.skipped.values())
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.time() - self.started_at
+        return self.rows / elapsed if elapsed else 0
+
+    def run(self, path):
+        self.started_at = time.time()
+        labels = {model._meta.label_lower: model for pass_models in PASSES for model in pass_models}
+        with imported_timestamps(), connection.constraint_checks_disabled():
+            for pass_models in PASSES:
+                batches = {model: [] for model in pass_models}
+                for record in read_records(path):
+                    model = labels.get(record['model'])
+                    if model not in batches:
+                        continue
+                    batches[model].append(record)
+                    if len(batches[model]) >= self.batch_size:
+                        # The rows may refer to rows of the models before it in the pass, which are imported first
+                        for earlier in pass_models[:pass_models.index(model) + 1]:
+                            self.import_batch(earlier, batches[earlier])
+                            batches[earlier] = []
+                for model in pass_models:
+                    self.import_batch(model, batches[model])
+        self.set_current_versions()
+        Article.objects.update_statistics()
+        self.reset_sequences()
+        get_search_backend().rebuild(Article.objects.all())
+        # bulk_create and update() bypass the invalidation in save()
+        representation_cache.clear()
+
+    def import_batch(self, model, records):
+        if not records:
+            return
+        existing = set(model.objects.filter(pk__in=[record['pk'] for record in records])
+                       .values_list('pk', flat=True))
+        # Articles that are already there keep their current version
+        if model is Article:
+            for record in records:
+                if record['pk'] not in existing and record['fields'].get('current_version') is not None:
+                    self.current_versions[record['pk']] = record['fields']['current_version']
+
+        objects = []
+        for deserialized in Deserializer([record for record in records if record['pk'] not in existing],
+                                         ignorenonexistent=True):
+            obj = deserialized.object
+            if model is Member and not obj.password:
+                obj.password = make_password(None)
+            if model is Article:
+                obj.current_version_id = None
+            # Versions without a stored diff are left for compute_diffs, even if the export says they are ready
+            if model is ArticleVersion and obj.stored_diff is None:
+                obj.diff_status = ArticleVersion.DIFF_STATUS.PENDING
+            objects.append(obj)
+
+        # Like loaddata, checks the foreign keys of the rows before they are committed, since they are not checked
+        # while constraint checks are disabled
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+            connection.check_constraints(table_names=[model._meta.db_table])
+
+        label = model._meta.label_lower
+        self.created[label] = self.created.get(label, 0) + len(objects)
+        self.skipped[label] = self.skipped.get(label, 0) + len(existing)
+        if self.progress:
+            self.progress(self)
+
+    def set_current_versions(self):
+        article_ids = list(self.current_versions)
+        for start in range(0, len(article_ids), self.batch_size):
+            batch = article_ids[start:start + self.batch_size]
+            with transaction.atomic():
+                Article.objects.filter(pk__in=batch).update(current_version=Case(
+                    *[When(pk=article_id, then=Value(self.current_versions[article_id])) for article_id in batch],
+                    output_field=models.IntegerField()
+                ))
+
+    # Like loaddata, moves the sequences of the primary keys past the imported rows
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(no_style(), [Member, Category, Article, ArticleVersion])
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
@@ -0,0 +1,182 @@
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api_graphql.documents import persisted_queries
+from data_models.cache import comparison_cache, representation_cache
+from data_models.diffs import WORD_PATTERN, process_diff
+from data_models.models import Article, ArticleVersion, Category, Member
+from revoltwiki.instrumentation import recorder
+
+
+class Command(BaseCommand):
+    help = ('Measures the latency, throughput and query counts of the hot paths of the REST and GraphQL APIs on a '
+            'synthetic wiki made from the dummy data, and prints the results as JSON. Runs in a separate test '
+            'database, with the representation cache cleared before every request (cold) and kept (warm).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixture', default=os.path.join(settings.BASE_DIR, 'dummy_data.json'),
+                            help='The data to take titles and words from (default: dummy_data.json)')
+        parser.add_argument('--members', type=int, default=20, help='How many members to create (default: 20)')
+        parser.add_argument('--categories', type=int, default=10,
+                            help='How many categories to create (default: 10)')
+        parser.add_argument('--articles', type=int, default=200, help='How many articles to create (default: 200)')
+        parser.add_argument('--versions', type=int, default=10,
+                            help='How many versions to create of every article (default: 10)')
+        parser.add_argument('--content-length', type=int, default=2000, dest='content_length',
+                            help='The approximate number of characters in every version (default: 2000)')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='How many requests to make to each path in each cache mode (default: 100)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic wiki and the requests')
+        parser.add_argument('--output', default=None, help='Write the results to this file instead of the output')
+
+    def handle(self, *args, **options):
+        with open(options['fixture']) as fixture:
+            records = json.load(fixture)
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                    MIDDLEWARE_CLASSES=['revoltwiki.instrumentation.InstrumentationMiddleware'] +
+                    settings.MIDDLEWARE_CLASSES,
+                    INSTRUMENTATION_SAMPLES=options['requests'], INSTRUMENTATION_SLOW_REQUEST_TIME=None,
+                    ALLOWED_HOSTS=['testserver']):
+                self.create_wiki(records, random.Random(options['seed']), options)
+                results = self.run_scenarios(random.Random(options['seed']), options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = json.dumps({
+            'commit': self.commit(),
+            'database': connection.vendor,
+            'options': {name: options[name] for name in ('members', 'categories', 'articles', 'versions',
+                                                         'content_length', 'requests', 'seed')},
+            'results': results,
+        }, indent=2)
+        if options['output'] is None:
+            self.stdout.write(report)
+        else:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                           stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def create_wiki(self, records, rng, options):
+        by_model = {}
+        for record in records:
+            by_model.setdefault(record['model'], []).append(record)
+        words = [word for record in by_model.get('data_models.articleversion', [])
+                 for word in WORD_PATTERN.findall(record['fields']['content']) if not word.isspace()]
+        titles = [record['fields']['title'] for record in by_model.get('data_models.article', [])]
+        category_titles = [record['fields']['title'] for record in by_model.get('data_models.category', [])]
+        if not words or not titles or not category_titles:
+            raise CommandError('The fixture needs categories, articles and article versions')
+
+        members = [Member.objects.create_user('member{i}'.format(i=i), 'member{i}@example.com'.format(i=i))
+                   for i in range(options['members'])]
+        Category.objects.bulk_create([
+            Category(title='{title} {i}'.format(title=category_titles[i % len(category_titles)], i=i))
+            for i in range(options['categories'])])
+        categories = list(Category.objects.all())
+        Article.objects.bulk_create([
+            Article(title='{title} {i}'.format(title=titles[i % len(titles)], i=i), category=rng.choice(categories),
+                    created_by=rng.choice(members))
+            for i in range(options['articles'])])
+
+        # Every version changes a few words of the one before it
+        versions = []
+        for article in Article.objects.all():
+            content = self.generate_content(rng, words, options['content_length'])
+            for _ in range(options['versions']):
+                versions.append(ArticleVersion(content=' '.join(content), parent_article=article,
+                                               created_by=rng.choice(members)))
+                for _ in range(max(1, len(content) // 50)):
+                    content[rng.randrange(len(content))] = rng.choice(words)
+        ArticleVersion.objects.bulk_create(versions)
+
+        # bulk_create() may give versions the same creation time, which the diffs depend on the order of
+        version_ids = list(ArticleVersion.objects.order_by('pk').values_list('pk', flat=True))
+        started_at = timezone.now() - timedelta(seconds=len(version_ids))
+        for index, pk in enumerate(version_ids):
+            ArticleVersion.objects.filter(pk=pk).update(created_at=started_at + timedelta(seconds=index))
+        for article in Article.objects.all():
+            Article.objects.filter(pk=article.pk).update(current_version=article.versions.order_by('pk').last())
+        Article.objects.update_statistics()
+        for pk in version_ids:
+            process_diff(pk)
+
+    @staticmethod
+    def generate_content(rng, words, length):
+        content = []
+        while length > 0:
+            content.append(rng.choice(words))
+            length -= len(content[-1]) + 1
+        return content
+
+    def run_scenarios(self, rng, requests):
+        article_ids = list(Article.objects.values_list('pk', flat=True))
+        client = Client()
+
+        def get(path):
+            return lambda: client.get(path())
+
+        # The GraphQL queries are the persisted ones, sent by their id like clients do
+        query_ids = {filename: query_id for query_id, (filename, query) in persisted_queries.all().items()}
+
+        def graphql(filename, variables=lambda: None):
+            if filename not in query_ids:
+                raise CommandError('{filename} is not in GRAPHQL_PERSISTED_QUERIES'.format(filename=filename))
+            query_id = query_ids[filename]
+            return lambda: client.post('/graphql', json.dumps({'id': query_id, 'variables': variables()}),
+                                       content_type='application/json')
+
+        scenarios = [
+            ('article_list', get(lambda: '/api/articles/')),
+            ('article_detail', get(lambda: '/api/articles/{id}/'.format(id=rng.choice(article_ids)))),
+            ('article_version_list', get(lambda: '/api/article_versions/')),
+            ('article_version_list_by_line', get(lambda: '/api/article_versions/?diff_mode=line&context=3')),
+            ('category_list', get(lambda: '/api/categories/')),
+            ('graphql_article_list', graphql('article_list.graphql')),
+            ('graphql_article_history', graphql('article_history.graphql', lambda: {'id': rng.choice(article_ids)})),
+            ('graphql_categories', graphql('categories.graphql')),
+        ]
+
+        results = []
+        for cache in ('cold', 'warm'):
+            for name, request in scenarios:
+                self.check_response(name, request())
+                recorder.clear()
+                started_at = time.perf_counter()
+                for _ in range(requests):
+                    if cache == 'cold':
+                        representation_cache.clear()
+                        comparison_cache.clear()
+                    self.check_response(name, request())
+                elapsed = time.perf_counter() - started_at
+                (endpoint, stats), = recorder.stats().items()
+                results.append(dict([('scenario', name), ('cache', cache), ('endpoint', endpoint),
+                                     ('requests_per_second', requests / elapsed)] + list(stats.items())))
+        return results
+
+    @staticmethod
+    def check_response(name, response):
+        if response.status_code != 200 or (name.startswith('graphql') and
+                                           'errors' in json.loads(response.content.decode())):
+            raise CommandError('{name} failed with {status}: {content}'.format(
+                name=name, status=response.status_code, content=response.content.decode()[:500]))
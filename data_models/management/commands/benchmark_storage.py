@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from data_models.models import Article, ArticleVersion, Category, Member
+from data_models.storage import zstandard
+
+
+class Command(BaseCommand):
+    help = ('Measures the size of the stored article versions and the latency of reading them, without compression '
+            'and with each available compression, on the dummy data scaled up. Runs in a separate test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixture', default=os.path.join(settings.BASE_DIR, 'dummy_data.json'),
+                            help='The data to scale up (default: dummy_data.json)')
+        parser.add_argument('--scale', type=int, default=1000,
+                            help='How many copies of every article and its versions to create (default: 1000)')
+        parser.add_argument('--reads', type=int, default=2000,
+                            help='How many random versions to read in each mode (default: 2000)')
+
+    def handle(self, *args, **options):
+        with open(options['fixture']) as fixture:
+            records = json.load(fixture)
+        modes = [None, 'zlib'] + (['zstd'] if zstandard is not None else [])
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write('{mode:<6} {versions:>9} {content:>14} {database:>14} {read:>12} {list:>12}'.format(
+                mode='mode', versions='versions', content='content bytes', database='database bytes',
+                read='read (ms)', list='list (ms)'))
+            for mode in modes:
+                with override_settings(ARTICLE_VERSION_COMPRESSION=mode):
+                    result = self.measure(records, options['scale'], options['reads'])
+                self.stdout.write('{mode:<6} {versions:>9} {content:>14} {database:>14} {read:>12.3f} {list:>12.3f}'
+                                  .format(mode=mode or 'none', **result))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def measure(self, records, scale, reads):
+        ArticleVersion.objects.all().delete()
+        Article.objects.all().delete()
+        self.create_data(records, scale)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*), SUM(LENGTH(content)) FROM data_models_articleversion')
+            versions, content = cursor.fetchone()
+        ids = list(ArticleVersion.objects.values_list('pk', flat=True))
+        sample = [random.choice(ids) for _ in range(reads)]
+
+        # Reading a version includes decompressing its content
+        started_at = time.time()
+        for pk in sample:
+            ArticleVersion.objects.get(pk=pk).content
+        read = (time.time() - started_at) / reads * 1000
+
+        # Listing versions without their content never decompresses it
+        started_at = time.time()
+        for pk in sample[:reads // 10 or 1]:
+            list(ArticleVersion.objects.filter(pk__gte=pk).order_by('pk')[:100])
+        listing = (time.time() - started_at) / (reads // 10 or 1) * 1000
+
+        return {'versions': versions, 'content': content, 'database': self.database_size(),
+                'read': read, 'list': listing}
+
+    @staticmethod
+    def database_size():
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA page_count')
+                page_count = cursor.fetchone()[0]
+                cursor.execute('PRAGMA page_size')
+                return page_count * cursor.fetchone()[0]
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_database_size(current_database())')
+                return cursor.fetchone()[0]
+        return None
+
+    @staticmethod
+    def create_data(records, scale):
+        by_model = {}
+        for record in records:
+            by_model.setdefault(record['model'], []).append(record)
+        member = Member.objects.first() or Member.objects.create_user('benchmark', 'benchmark@example.com')
+        category = Category.objects.first() or Category.objects.create(title='Benchmark')
+
+        for copy in range(scale):
+            articles = {record['pk']: Article(title='{title} {copy}'.format(title=record['fields']['title'], copy=copy),
+                                              category=category, created_by=member)
+                        for record in by_model.get('data_models.article', [])}
+            Article.objects.bulk_create(articles.values())
+            # bulk_create() does not set the primary keys on SQLite
+            by_title = {article.title: article for article in Article.objects.filter(
+                title__in=[article.title for article in articles.values()])}
+            articles = {pk: by_title[article.title] for pk, article in articles.items()}
+            ArticleVersion.objects.bulk_create([
+                ArticleVersion(content=record['fields']['content'], created_by=member,
+                               parent_article=articles[record['fields']['parent_article']])
+                for record in by_model.get('data_models.articleversion', [])
+            ])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from data_models.models import ArticleVersion
+from data_models.storage import keyframe_interval
+
+
+class Command(BaseCommand):
+    help = ('Stores article versions as patches against the following version, keeping the latest version and '
+            'every ARTICLE_VERSION_KEYFRAME_INTERVAL-th version in full')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', dest='full', default=False,
+                            help='Store every article version in full again, like before delta storage')
+
+    def handle(self, *args, **options):
+        changed = ArticleVersion.objects.all().compact(delta=not options['full'])
+        if options['full']:
+            self.stdout.write('Stored {changed} article versions in full'.format(changed=changed))
+        else:
+            self.stdout.write('Compacted {changed} article versions with a keyframe every {interval} versions'.format(
+                changed=changed, interval=keyframe_interval()))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from data_models.diffs import process_diff
+from data_models.models import ArticleVersion
+
+
+class Command(BaseCommand):
+    help = 'Computes and stores the diff of every article version whose diff is pending or failed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', dest='all', default=False,
+                            help='Recompute the stored diffs of all article versions, not only the missing ones')
+        parser.add_argument('--timeout', type=float, default=None,
+                            help='Seconds to spend on each diff before settling for a coarser one '
+                                 '(default: ARTICLE_VERSION_DIFF_TIMEOUT, 0 for no limit)')
+        parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                            help='Afterwards, keep computing new pending diffs, checking with this interval '
+                                 '(for QueueDiffBackend)')
+
+    def handle(self, *args, **options):
+        # Diffs being computed elsewhere are not stored over the recomputed ones (see ArticleVersion.store_diff)
+        if options['all']:
+            ArticleVersion.objects.update(diff_status=ArticleVersion.DIFF_STATUS.PENDING,
+                                          diff_generation=F('diff_generation') + 1)
+        statuses = [ArticleVersion.DIFF_STATUS.PENDING, ArticleVersion.DIFF_STATUS.FAILED]
+
+        while True:
+            stored, skipped, failed = self.process(statuses, options['timeout'])
+            if stored or skipped or failed or options['watch'] is None:
+                self.stdout.write('Stored diffs for {stored} article versions, skipped {skipped} that were ready or '
+                                  'invalidated, {failed} failed'.format(stored=stored, skipped=skipped,
+                                                                         failed=failed))
+            if options['watch'] is None:
+                break
+            # Failed diffs are only retried when the command is started again
+            statuses = [ArticleVersion.DIFF_STATUS.PENDING]
+            time.sleep(options['watch'])
+
+    # Versions that another worker made ready, or whose diff was invalidated while it was computed, are skipped
+    @staticmethod
+    def process(statuses, timeout):
+        stored = skipped = failed = 0
+        article_versions = ArticleVersion.objects.filter(diff_status__in=statuses).order_by('created_at')
+        for article_version_id in article_versions.values_list('pk', flat=True):
+            result = process_diff(article_version_id, timeout)
+            if result:
+                stored += 1
+            elif result is None:
+                skipped += 1
+            else:
+                failed += 1
+        return stored, skipped, failed
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from data_models.export import export_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Exports all members, categories, articles and article versions as newline delimited JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', dest='since', default=None,
+                            help='Only export articles updated and versions created at or after this ISO 8601 time')
+        parser.add_argument('--output', '-o', dest='output', default=None,
+                            help='The file to write to, instead of standard output')
+        parser.add_argument('--include-passwords', action='store_true', dest='include_passwords', default=False,
+                            help='Include the password hashes of the members')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_datetime(options['since'])
+            except ValueError:
+                since = None
+            if since is None:
+                raise CommandError('--since must be an ISO 8601 date and time')
+
+        lines = export_ndjson(since, options['include_passwords'])
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from data_models.importer import Importer, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Imports members, categories, articles and article versions in batches from a newline delimited JSON '
+            'export (see export_wiki) or a JSON fixture like dummy_data.json. Rows that already exist are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The file to import')
+        parser.add_argument('--batch-size', type=int, dest='batch_size', default=BATCH_SIZE,
+                            help='The number of rows to insert per transaction')
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'], progress=self.report_progress if options['verbosity'] > 1 else None)
+        importer.run(options['path'])
+
+        for label in sorted(importer.created):
+            self.stdout.write('{label}: {created} created, {skipped} skipped'.format(
+                label=label, created=importer.created[label], skipped=importer.skipped[label]))
+        self.stdout.write('Imported {rows} rows ({rate:.0f} rows/second)'.format(
+            rows=importer.rows, rate=importer.rows_per_second))
+        self.stdout.write('Run compute_diffs to store the diffs of the imported versions')
+
+    def report_progress(self, importer):
+        self.stdout.write('{rows} rows ({rate:.0f} rows/second)'.format(
+            rows=importer.rows, rate=importer.rows_per_second))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from data_models.models import Article
+from data_models.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index over the current content of all articles'
+
+    def handle(self, *args, **options):
+        get_search_backend().rebuild(Article.objects.all())
+        self.stdout.write('Rebuilt the search index for {count} articles'.format(count=Article.objects.count()))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from data_models.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the version count, author count and last edit of every article from its versions'
+
+    def handle(self, *args, **options):
+        changed = Article.objects.update_statistics()
+        self.stdout.write('Updated the statistics of {changed} of {count} articles'.format(
+            changed=changed, count=Article.objects.count()))
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.7 on 2026-10-18 08:56
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articleversion',
+            name='stored_diff',
+            field=models.TextField(blank=True, default=None, editable=False, null=True),
+        ),
+    ]
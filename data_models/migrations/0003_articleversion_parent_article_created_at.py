@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.7 on 2026-10-18 08:56
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# Diffs stored so far were computed against the previous version of any article
+def clear_stored_diffs(apps, schema_editor):
+    ArticleVersion = apps.get_model('data_models', 'ArticleVersion')
+    ArticleVersion.objects.update(stored_diff=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0002_articleversion_stored_diff'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='articleversion',
+            index_together=set([('parent_article', 'created_at')]),
+        ),
+        migrations.RunPython(clear_stored_diffs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# The index as it was created by data_models.search when this migration was written, so that later changes to the
+# search backends do not change what the migration does
+SQL = {
+    'sqlite': {
+        'create': [
+            'CREATE VIRTUAL TABLE IF NOT EXISTS data_models_article_search USING fts5(title, content)',
+            'INSERT INTO data_models_article_search (rowid, title, content) '
+            'SELECT article.id, article.title, COALESCE(version.content, \'\') FROM data_models_article article '
+            'LEFT JOIN data_models_articleversion version ON version.id = article.current_version_id',
+        ],
+        'drop': [
+            'DROP TABLE IF EXISTS data_models_article_search',
+        ],
+    },
+    'postgresql': {
+        'create': [
+            'CREATE TABLE IF NOT EXISTS data_models_article_search ('
+            'article_id integer PRIMARY KEY, document tsvector NOT NULL)',
+            'CREATE INDEX IF NOT EXISTS data_models_article_search_document ON data_models_article_search '
+            'USING gin(document)',
+            'INSERT INTO data_models_article_search (article_id, document) '
+            'SELECT article.id, setweight(to_tsvector(article.title), \'A\') || '
+            'to_tsvector(COALESCE(version.content, \'\')) FROM data_models_article article '
+            'LEFT JOIN data_models_articleversion version ON version.id = article.current_version_id',
+        ],
+        'drop': [
+            'DROP TABLE IF EXISTS data_models_article_search',
+        ],
+    },
+}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in SQL.get(schema_editor.connection.vendor, {}).get('create', []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in SQL.get(schema_editor.connection.vendor, {}).get('drop', []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0004_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
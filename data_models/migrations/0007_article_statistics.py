@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.7 on 2026-10-18 09:15
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def compute_statistics(apps, schema_editor):
+    Article = apps.get_model('data_models', 'Article')
+    ArticleVersion = apps.get_model('data_models', 'ArticleVersion')
+    counts = {row['parent_article']: row for row in ArticleVersion.objects.order_by().values('parent_article').annotate(
+        version_count=models.Count('pk'), author_count=models.Count('created_by', distinct=True))}
+    for article in Article.objects.select_related('current_version'):
+        current_version = article.current_version
+        Article.objects.filter(pk=article.pk).update(
+            version_count=counts.get(article.pk, {}).get('version_count', 0),
+            author_count=counts.get(article.pk, {}).get('author_count', 0),
+            last_edited_by_id=current_version.created_by_id if current_version else None,
+            last_edited_at=current_version.created_at if current_version else article.created_at,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0006_article_access_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='author_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='last_edited_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='last_edited_by',
+            field=models.ForeignKey(blank=True, default=None, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='version_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compute_statistics, migrations.RunPython.noop),
+    ]
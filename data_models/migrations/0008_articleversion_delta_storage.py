@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.7 on 2026-10-18 09:19
+from __future__ import unicode_literals
+
+import data_models.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0007_article_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articleversion',
+            name='delta_base',
+            field=models.IntegerField(blank=True, db_index=True, default=None, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='articleversion',
+            name='content',
+            field=data_models.storage.VersionContentField(),
+        ),
+    ]
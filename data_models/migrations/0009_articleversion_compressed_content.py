@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+import data_models.storage
+
+
+# The compressed content is written to a new column, which then replaces the text column
+def compress_contents(apps, schema_editor):
+    ArticleVersion = apps.get_model('data_models', 'ArticleVersion')
+    for pk, content in ArticleVersion.objects.values_list('pk', 'content').iterator():
+        ArticleVersion.objects.filter(pk=pk).update(compressed_content=content)
+
+
+def decompress_contents(apps, schema_editor):
+    ArticleVersion = apps.get_model('data_models', 'ArticleVersion')
+    for pk, compressed_content in ArticleVersion.objects.values_list('pk', 'compressed_content').iterator():
+        ArticleVersion.objects.filter(pk=pk).update(content=data_models.storage.decode_text(compressed_content))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0008_articleversion_delta_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articleversion',
+            name='compressed_content',
+            field=data_models.storage.CompressedTextField(null=True),
+        ),
+        # Lets the text column be added back empty when migrating backwards
+        migrations.AlterField(
+            model_name='articleversion',
+            name='content',
+            field=data_models.storage.VersionContentField(blank=True),
+        ),
+        migrations.RunPython(compress_contents, decompress_contents),
+        migrations.RemoveField(
+            model_name='articleversion',
+            name='content',
+        ),
+        migrations.RenameField(
+            model_name='articleversion',
+            old_name='compressed_content',
+            new_name='content',
+        ),
+        migrations.AlterField(
+            model_name='articleversion',
+            name='content',
+            field=data_models.storage.CompressedVersionContentField(),
+        ),
+    ]
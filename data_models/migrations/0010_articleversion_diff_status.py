@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.7 on 2026-10-18 09:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# Versions with a stored diff are ready. The rest are left for compute_diffs, or enqueued when their diff is read.
+def mark_stored_diffs_ready(apps, schema_editor):
+    ArticleVersion = apps.get_model('data_models', 'ArticleVersion')
+    ArticleVersion.objects.filter(stored_diff__isnull=False).update(diff_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0009_articleversion_compressed_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articleversion',
+            name='diff_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', editable=False, max_length=8),
+        ),
+        migrations.RunPython(mark_stored_diffs_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+import data_models.slugs
+
+
+# The slugs are added without the unique index, which is added once every row has its own slug
+def populate_slugs(apps, schema_editor):
+    for model_name in ('Category', 'Article'):
+        model = apps.get_model('data_models', model_name)
+        field = model._meta.get_field('slug')
+        for obj in model.objects.order_by('pk'):
+            model.objects.filter(pk=obj.pk).update(slug=field.pre_save(obj, False))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0010_articleversion_diff_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=data_models.slugs.TitleSlugField(default='', unique=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='slug',
+            field=data_models.slugs.TitleSlugField(default='', unique=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=data_models.slugs.TitleSlugField(),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='slug',
+            field=data_models.slugs.TitleSlugField(),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.7 on 2026-10-18 10:09
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_models', '0011_article_category_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articleversion',
+            name='diff_generation',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,13 +1,31 @@
-from django.db import models
+import json
+
+from django.db import connection, models, transaction
+from django.db.models import Count, F
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 from django.utils.deconstruct import deconstructible
 from django.core.mail import send_mail
 from django.utils.translation import ugettext_lazy as _
-from django.utils.text import slugify
 from django.core.exceptions import FieldError
 
-from diff_match_patch import diff_match_patch
+from .cache import comparison_cache, representation_cache
+from . import diffs
+from .diffs import get_diff_backend
+from .search import get_search_backend
+from .slugs import TitleSlugField, TitleSlugMixin, TitleSlugQuerySet
+from .storage import CompressedVersionContentField, apply_patch, decode_text, delta_storage_enabled, encode_text, \
+    keyframe_interval, make_patch
+
+
+class EditConflict(Exception):
+    """
+    Raised when an article version is saved on top of another version than the current version of its article
+    """
+
+    def __init__(self, current_version_id):
+        super(EditConflict, self).__init__('The current version of the article is {id}'.format(id=current_version_id))
+        self.current_version_id = current_version_id
 
 
 class MemberManager(BaseUserManager):
@@ -32,6 +50,26 @@ class MemberManager(BaseUserManager):
     def create_superuser(self, username, email, password, **extra_fields):
         return self._create_user(username, email, password, True, True, **extra_fields)
 
+    # Resolves the contributed articles of many members at once, so that contributions_by_article() needs no queries.
+    # With an access bitmask, only the articles accessible with it are resolved.
+    def attach_contributions_by_article(self, members, access=None):
+        members = list(members)
+        if not members:
+            return members
+        if access is None:
+            access = Article.ACCESS.EVERY
+        article_ids_by_member = {member.pk: [] for member in members}
+        for member_id, article_id in ArticleVersion.objects.accessible(access).filter(
+                created_by__in=members).values_list('created_by_id', 'parent_article_id').distinct():
+            article_ids_by_member[member_id].append(article_id)
+        articles = Article.objects.accessible(access).in_bulk(
+            set(article_id for article_ids in article_ids_by_member.values() for article_id in article_ids)
+        )
+        for member in members:
+            member._contributions_by_article_cache = [articles[article_id]
+                                                      for article_id in article_ids_by_member[member.pk]]
+        return members
+
 
 class AbstractMember(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(_('username'), max_length=40, unique=True)
@@ -43,7 +81,7 @@ class AbstractMember(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(_('active'), default=True,
                                     help_text=_('Designates whether this user should be treated as active. '
                                                 'Deselect this instead of deleting accounts.'))
-    date_joined = models.DateTimeField(_('date joined'), default=timezone.now)
+    date_joined = models.DateTimeField(_('date joined'), default=timezone.now, db_index=True)
 
     objects = MemberManager()
 
@@ -76,15 +114,31 @@ class Member(AbstractMember):
         return self.get_short_name()
 
     def contributions_by_article(self):
-        return list(set([version.parent_article for version in self.contributions_by_version.all()]))
+        try:
+            return self._contributions_by_article_cache
+        except AttributeError:
+            return list(Article.objects.filter(version__created_by=self).distinct())
 
 
 @deconstructible
-class Category(models.Model):
+class Category(TitleSlugMixin, models.Model):
     title = models.CharField(max_length=128, unique=True)
+    slug = TitleSlugField()
 
-    def slug(self):
-        return slugify(self.title, allow_unicode=True)
+    objects = TitleSlugQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        super(Category, self).save(*args, **kwargs)
+        representation_cache.invalidate('category', self.pk)
+
+    # The articles of a deleted category are moved away from it, which changes their representation
+    def delete(self, *args, **kwargs):
+        category_id = self.pk
+        article_ids = list(self.articles.values_list('pk', flat=True))
+        deleted = super(Category, self).delete(*args, **kwargs)
+        representation_cache.invalidate('category', category_id)
+        representation_cache.invalidate('article', *article_ids)
+        return deleted
 
     def __unicode__(self):
         return self.title
@@ -93,31 +147,299 @@ class Category(models.Model):
         return str(self.__unicode__())
 
 
+class ArticleVersionQuerySet(models.QuerySet):
+    def accessible(self, access):
+        """
+        Returns the versions of the articles accessible with the given access bitmask (see Article.allowed_access)
+        """
+        if access == Article.ACCESS.EVERY:
+            return self
+        return self.filter(parent_article__access__in=Article.access_levels(access))
+
+    def compact(self, delta=True):
+        """
+        Stores the versions of every article in the queryset as patches against the following version, keeping every
+        keyframe_interval()-th and the latest version in full. With delta=False every version is stored in full.
+
+        Returns how many versions changed. Versions are also stored again if the compression settings changed.
+        """
+        changed = 0
+        for article_id in self.order_by().values_list('parent_article_id', flat=True).distinct():
+            versions = list(ArticleVersion.objects.filter(parent_article_id=article_id).order_by('created_at'))
+            contents = ArticleVersion.resolve_contents(versions)
+            with transaction.atomic():
+                for index, version in enumerate(versions):
+                    following = versions[index + 1] if index + 1 < len(versions) else None
+                    stored_content, delta_base = contents[version.pk], None
+                    if delta and following is not None and index % keyframe_interval():
+                        patch = ArticleVersion.encode_delta(contents[following.pk], contents[version.pk])
+                        if patch is not None:
+                            stored_content, delta_base = patch, following.pk
+                    # Also stores the versions again if the compression settings changed
+                    if (version.stored_content, version.delta_base) != (encode_text(stored_content), delta_base):
+                        ArticleVersion.objects.filter(pk=version.pk).update(content=stored_content,
+                                                                            delta_base=delta_base)
+                        changed += 1
+        return changed
+
+    # Resolves the previous versions of many versions at once, along with the contents of both, so that
+    # previous_version() and the contents need no further queries
+    def attach_previous_versions(self, versions):
+        versions = list(versions)
+        if not versions:
+            return versions
+        table = connection.ops.quote_name(ArticleVersion._meta.db_table)
+        previous_ids = (
+            '{table}.id IN (SELECT (SELECT previous.id FROM {table} previous '
+            'WHERE previous.parent_article_id = version.parent_article_id AND previous.created_at < version.created_at '
+            'ORDER BY previous.created_at DESC LIMIT 1) FROM {table} version WHERE version.id IN ({ids}))'
+        ).format(table=table, ids=', '.join(['%s'] * len(versions)))
+        previous_versions = list(ArticleVersion.objects.extra(where=[previous_ids],
+                                                              params=[version.pk for version in versions]))
+        # The contents of versions read without them are read along with those of the previous versions
+        deferred = [version.pk for version in versions if 'stored_content' in version.get_deferred_fields()]
+        loaded = ArticleVersion.objects.only('content', 'delta_base').in_bulk(deferred) if deferred else {}
+        contents = ArticleVersion.resolve_contents(
+            previous_versions + [loaded.get(version.pk, version) for version in versions])
+        previous_by_article = {}
+        for previous in previous_versions:
+            previous._content = contents[previous.pk]
+            previous_by_article.setdefault(previous.parent_article_id, []).append(previous)
+        for version in versions:
+            version._content = contents[version.pk]
+            earlier = [previous for previous in previous_by_article.get(version.parent_article_id, ())
+                       if previous.created_at < version.created_at]
+            version._previous_version = max(earlier, key=lambda previous: previous.created_at) if earlier else None
+        return versions
+
+
 class ArticleVersion(models.Model):
-    content = models.TextField()
+    content = CompressedVersionContentField()
     parent_article = models.ForeignKey('Article', related_name='versions', related_query_name='version')
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     created_by = models.ForeignKey(Member, related_name='contributions_by_version',
                                    related_query_name='version_contribution')
+    # The diff against the previous version, stored as compact JSON ([[type, text], ...])
+    stored_diff = models.TextField(blank=True, null=True, default=None, editable=False)
+
+    class DIFF_STATUS:
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
+    DIFF_STATUS_CHOICES = (
+        (DIFF_STATUS.PENDING, _('Pending')),
+        (DIFF_STATUS.READY, _('Ready')),
+        (DIFF_STATUS.FAILED, _('Failed')),
+    )
+
+    # Diffs are computed by the configured diff backend, possibly after the version is saved (see diffs.py)
+    diff_status = models.CharField(max_length=8, choices=DIFF_STATUS_CHOICES, default=DIFF_STATUS.PENDING,
+                                   editable=False, db_index=True)
+    # Incremented whenever the diff is invalidated, so that a diff computed before that is never stored (see store_diff)
+    diff_generation = models.PositiveIntegerField(default=0, editable=False)
+    # With delta storage, the id of the version the stored content is a patch against, or None if stored in full
+    delta_base = models.IntegerField(blank=True, null=True, default=None, editable=False, db_index=True)
+
+    # The id of the version an edit is based on. If set, saving fails with EditConflict unless it is still the
+    # current version of the article (see Article.record_version).
+    base_version_id = None
+
+    objects = ArticleVersionQuerySet.as_manager()
+
+    class Meta:
+        # Supports looking up the previous and next version of an article
+        index_together = [('parent_article', 'created_at')]
 
     def access(self):
         return self.parent_article.access
 
-    def diff(self):
+    # The content is decompressed, and reconstructed from patches, when it is first read
+    def get_content(self):
         try:
-            previous_article_version = ArticleVersion.objects.filter(created_at__lt=self.created_at).order_by('-created_at')[0]
-            diff = diff_match_patch()
-            d = diff.diff_main(previous_article_version.content, self.content)
-            diff.diff_cleanupSemantic(d)
-            return [{'type': t, 'text': txt} for (t, txt) in d]
-        except IndexError:
-            return [{'type': 1, 'text': self.content}]
-
-    # Sets the new article version as the current version of the parent article
+            return self._content
+        except AttributeError:
+            if self.delta_base is None:
+                self._content = decode_text(self.stored_content)
+            else:
+                self._content = ArticleVersion.resolve_contents([self])[self.pk]
+            return self._content
+
+    def set_content(self, content):
+        self.stored_content = self._content = content
+        self.delta_base = None
+
+    @staticmethod
+    def resolve_contents(versions):
+        """
+        Returns the full content of the given versions by id, applying the patches of those stored as deltas
+
+        Versions stored in full among the given ones are used as bases, others are fetched.
+        """
+        versions_by_id = {version.pk: version for version in versions}
+        contents = {}
+        # The bases are fetched together, one step along the chains of patches at a time
+        missing = {version.delta_base for version in versions if version.delta_base is not None}
+        missing.difference_update(versions_by_id)
+        while missing:
+            bases = ArticleVersion.objects.only('content', 'delta_base').in_bulk(missing)
+            versions_by_id.update(bases)
+            missing = {base.delta_base for base in bases.values() if base.delta_base is not None}
+            missing.difference_update(versions_by_id)
+
+        def resolve(version):
+            patches = []
+            while version.delta_base is not None and version.pk not in contents:
+                patches.append(version)
+                base = versions_by_id.get(version.delta_base)
+                if base is None:
+                    base = ArticleVersion.objects.only('content', 'delta_base').get(pk=version.delta_base)
+                    versions_by_id[base.pk] = base
+                version = base
+            if version.pk not in contents:
+                contents[version.pk] = decode_text(version.stored_content)
+            content = contents[version.pk]
+            for patched in reversed(patches):
+                content = contents[patched.pk] = apply_patch(content, decode_text(patched.stored_content))
+
+        for version in versions:
+            resolve(version)
+        return {version.pk: contents[version.pk] for version in versions}
+
+    @staticmethod
+    def encode_delta(base, content):
+        """
+        Returns a patch from base to content, or None if the patch is not smaller or does not reproduce the content
+        """
+        patch = make_patch(base, content)
+        if len(patch) >= len(content) or apply_patch(base, patch) != content:
+            return None
+        return patch
+
+    # With delta storage, the previous version becomes a patch against this one, unless it is a keyframe. It is a
+    # keyframe if it is the first version, like in compact(), or if making it a patch would make the chain of patches
+    # from the versions before it reach keyframe_interval(), which deleted versions may have changed the length of.
+    def store_previous_as_delta(self, previous_article_version):
+        if previous_article_version is None or previous_article_version.delta_base is not None:
+            return
+        earlier = list(ArticleVersion.objects.filter(
+            parent_article_id=self.parent_article_id, created_at__lt=previous_article_version.created_at
+        ).order_by('-created_at').values_list('pk', 'delta_base')[:keyframe_interval() - 1])
+        chain_length, base_id = 0, previous_article_version.pk
+        for pk, delta_base in earlier:
+            if delta_base != base_id:
+                break
+            chain_length, base_id = chain_length + 1, pk
+        if not earlier or chain_length + 1 >= keyframe_interval():
+            return
+        patch = self.encode_delta(self.content, previous_article_version.content)
+        if patch is not None:
+            ArticleVersion.objects.filter(pk=previous_article_version.pk).update(content=patch, delta_base=self.pk)
+
+    # Versions stored as patches against this one are stored in full before its content changes or it is deleted
+    def store_dependents_in_full(self):
+        dependents = list(ArticleVersion.objects.filter(delta_base=self.pk))
+        for dependent_id, content in ArticleVersion.resolve_contents(dependents).items():
+            ArticleVersion.objects.filter(pk=dependent_id).update(content=content, delta_base=None)
+
+    # Uses the previous version attached by ArticleVersionQuerySet.attach_previous_versions(), if any
+    def previous_version(self):
+        if hasattr(self, '_previous_version'):
+            return self._previous_version
+        return ArticleVersion.objects.filter(parent_article_id=self.parent_article_id,
+                                             created_at__lt=self.created_at).order_by('-created_at').first()
+
+    def next_version(self):
+        return ArticleVersion.objects.filter(parent_article_id=self.parent_article_id,
+                                             created_at__gt=self.created_at).order_by('created_at').first()
+
+    def compute_diff(self, timeout=None, mode=diffs.CHAR):
+        previous_article_version = self.previous_version()
+        if previous_article_version is None:
+            return [[1, self.content]]
+        return diffs.compute_diff(previous_article_version.content, self.content, mode, timeout)
+
+    # The diff is only stored if it has not been invalidated while it was computed, in which case the diff backend
+    # computes it again. Returns whether it was stored.
+    def store_diff(self, timeout=None):
+        self.stored_diff = json.dumps(self.compute_diff(timeout), separators=(',', ':'))
+        self.diff_status = ArticleVersion.DIFF_STATUS.READY
+        stored = ArticleVersion.objects.filter(pk=self.pk, diff_generation=self.diff_generation).update(
+            stored_diff=self.stored_diff, diff_status=self.diff_status)
+        representation_cache.invalidate('article_version', self.pk)
+        return bool(stored)
+
+    def invalidate_next_diff(self):
+        next_article_version = self.next_version()
+        if next_article_version is not None:
+            ArticleVersion.objects.filter(pk=next_article_version.pk).update(
+                stored_diff=None, diff_status=ArticleVersion.DIFF_STATUS.PENDING,
+                diff_generation=F('diff_generation') + 1)
+            next_article_version.refresh_from_db(fields=['stored_diff', 'diff_status', 'diff_generation'])
+            representation_cache.invalidate('article_version', next_article_version.pk)
+            get_diff_backend().enqueue(next_article_version)
+
+    # The character diff is computed by the diff backend, or lazily on first read for versions that lack it.
+    # Word and line diffs are computed when first asked for, and kept in the comparison cache until diff_generation
+    # changes. With context, only the changed hunks are returned.
+    def diff(self, mode=diffs.CHAR, context=None):
+        if mode not in diffs.MODES:
+            raise ValueError('Unknown diff mode {mode!r}'.format(mode=mode))
+        if mode == diffs.CHAR:
+            if self.stored_diff is None:
+                self.store_diff()
+            diff = json.loads(self.stored_diff)
+        else:
+            variant = '{generation}:{mode}'.format(generation=self.diff_generation, mode=mode)
+            diff = comparison_cache.get('diff', self.pk, variant)
+            if diff is None:
+                diff = self.compute_diff(mode=mode)
+                comparison_cache.set('diff', self.pk, variant, diff)
+        if context is not None:
+            return diffs.context_hunks(diff, context)
+        return diffs.segments(diff)
+
+    # Returns the diff if the diff backend has computed it, else None. Reading a pending diff enqueues it again, so that
+    # versions left pending, like those from before diff_status or from a process that stopped, are computed.
+    def ready_diff(self, mode=diffs.CHAR, context=None):
+        if self.diff_status == ArticleVersion.DIFF_STATUS.PENDING:
+            get_diff_backend().enqueue(self)
+        if self.diff_status != ArticleVersion.DIFF_STATUS.READY:
+            return None
+        return self.diff(mode, context)
+
+    # Sets the new article version as the current version of the parent article, and updates its edit statistics
+    # (see Article.record_version)
     def save(self, *args, **kwargs):
-        super(ArticleVersion, self).save(*args, **kwargs)
-        self.parent_article.current_version = self
-        self.parent_article.save()
+        rewritten = self.pk is not None
+        with transaction.atomic():
+            # Rewriting history invalidates this diff and the diff of the following version
+            if rewritten:
+                self.store_dependents_in_full()
+                self.stored_diff = None
+                self.diff_status = ArticleVersion.DIFF_STATUS.PENDING
+                self.diff_generation = F('diff_generation') + 1
+            super(ArticleVersion, self).save(*args, **kwargs)
+            if rewritten:
+                self.refresh_from_db(fields=['diff_generation'])
+                self.invalidate_next_diff()
+                representation_cache.invalidate('article_version', self.pk)
+                comparison_cache.clear()
+            get_diff_backend().enqueue(self)
+            self.parent_article.record_version(self, rewritten)
+            if delta_storage_enabled() and not rewritten:
+                self.store_previous_as_delta(self.previous_version())
+
+    # The next diff is invalidated after the deletion, so that it is computed against the version before this one
+    def delete(self, *args, **kwargs):
+        representation_cache.invalidate('article_version', self.pk)
+        parent_article_id = self.parent_article_id
+        with transaction.atomic():
+            self.store_dependents_in_full()
+            deleted = super(ArticleVersion, self).delete(*args, **kwargs)
+            self.invalidate_next_diff()
+            Article.objects.filter(pk=parent_article_id).update_statistics()
+        return deleted
 
     def __unicode__(self):
         return 'Versjon: {id}'.format(id=self.id)
@@ -126,8 +448,67 @@ class ArticleVersion(models.Model):
         return str(self.__unicode__())
 
 
-class Article(models.Model):
+class ArticleQuerySet(TitleSlugQuerySet):
+    def accessible(self, access):
+        """
+        Returns the articles accessible with the given access bitmask (see Article.allowed_access)
+        """
+        if access == Article.ACCESS.EVERY:
+            return self
+        return self.filter(access__in=Article.access_levels(access))
+
+    def update_statistics(self):
+        """
+        Recomputes the edit statistics of the articles from their versions, and returns how many of them changed
+        """
+        from .export import queryset_chunks
+
+        changed = 0
+        for articles in queryset_chunks(self.only('created_at', 'current_version', *Article.STATISTICS_FIELDS)):
+            counts = {row['parent_article']: row for row in ArticleVersion.objects.filter(
+                parent_article__in=articles).order_by().values('parent_article').annotate(
+                version_count=Count('pk'), author_count=Count('created_by', distinct=True))}
+            current_versions = ArticleVersion.objects.only('created_by', 'created_at').in_bulk(
+                [article.current_version_id for article in articles if article.current_version_id])
+            with transaction.atomic():
+                for article in articles:
+                    current_version = current_versions.get(article.current_version_id)
+                    statistics = {
+                        'version_count': counts.get(article.pk, {}).get('version_count', 0),
+                        'author_count': counts.get(article.pk, {}).get('author_count', 0),
+                        'last_edited_by_id': current_version.created_by_id if current_version else None,
+                        'last_edited_at': current_version.created_at if current_version else article.created_at,
+                    }
+                    if all(getattr(article, field) == value for field, value in statistics.items()):
+                        continue
+                    # The statistics are part of the representation of the article
+                    Article.objects.filter(pk=article.pk).update(updated_at=timezone.now(), **statistics)
+                    representation_cache.invalidate('article', article.pk)
+                    changed += 1
+        return changed
+
+
+class ArticleManager(models.Manager.from_queryset(ArticleQuerySet)):
+    # Resolves the authors of many articles at once, so that authors() needs no further queries
+    def attach_authors(self, articles):
+        articles = list(articles)
+        if not articles:
+            return articles
+        author_ids_by_article = {article.pk: [] for article in articles}
+        for article_id, member_id in ArticleVersion.objects.filter(parent_article__in=articles).values_list(
+                'parent_article_id', 'created_by_id').distinct():
+            author_ids_by_article[article_id].append(member_id)
+        members = Member.objects.in_bulk(
+            set(member_id for member_ids in author_ids_by_article.values() for member_id in member_ids)
+        )
+        for article in articles:
+            article._authors_cache = [members[member_id] for member_id in author_ids_by_article[article.pk]]
+        return articles
+
+
+class Article(TitleSlugMixin, models.Model):
     title = models.CharField(max_length=128, unique=True)
+    slug = TitleSlugField()
     category = models.ForeignKey(Category, on_delete=models.SET_DEFAULT, related_name='articles',
                                  related_query_name='article', default=None)
 
@@ -137,13 +518,14 @@ class Article(models.Model):
     current_version = models.ForeignKey(ArticleVersion, blank=True, null=True, default=None)
     deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
-    updated_at = models.DateTimeField(auto_now=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, editable=False, db_index=True)
     created_by = models.ForeignKey(Member, on_delete=models.PROTECT, related_name='+')
 
     class ACCESS:
         ALL = 0b1 << 0
         STAFF = 0b1 << 1
         SUPERUSER = 0b1 << 2
+        EVERY = ALL | STAFF | SUPERUSER
 
     ACCESS_CHOICES = (
         (ACCESS.ALL, _('All')),
@@ -154,24 +536,129 @@ class Article(models.Model):
 
     access = models.IntegerField(choices=ACCESS_CHOICES, default=ACCESS.ALL)
 
-    def authors(self):
-        return list(set([version.created_by for version in ArticleVersion.objects.filter(parent_article__id=self.id)]))
+    # Edit statistics, maintained by ArticleVersion.save() (see record_version) and update_statistics
+    version_count = models.PositiveIntegerField(default=0, editable=False)
+    author_count = models.PositiveIntegerField(default=0, editable=False)
+    last_edited_by = models.ForeignKey(Member, blank=True, null=True, default=None, editable=False,
+                                       on_delete=models.SET_NULL, related_name='+')
+    last_edited_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
 
-    def last_edited_by(self):
+    STATISTICS_FIELDS = ('version_count', 'author_count', 'last_edited_by', 'last_edited_at')
+
+    objects = ArticleManager()
+
+    class Meta:
+        # Supports listing the accessible articles by when they were updated
+        index_together = [('access', 'updated_at')]
+
+    # Superusers can access every article, staff articles for all and staff, and everyone else articles for all
+    @classmethod
+    def allowed_access(cls, user):
+        """
+        Returns the bitmask of the access levels the user can access
+        """
+        if user is None or not user.is_authenticated():
+            return cls.ACCESS.ALL
+        if user.is_superuser:
+            return cls.ACCESS.EVERY
+        if user.is_staff:
+            return cls.ACCESS.ALL | cls.ACCESS.STAFF
+        return cls.ACCESS.ALL
+
+    # An article is accessible if any of the levels of its access is allowed
+    @classmethod
+    def access_levels(cls, access):
+        return [level for level, _ in cls.ACCESS_CHOICES if level & access]
+
+    def is_accessible(self, access):
+        return access == self.ACCESS.EVERY or self.access in self.access_levels(access)
+
+    # Remembers the values loaded from the database, so that save() knows which cached representations changed
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Article, cls).from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def authors(self):
         try:
-            return self.current_version.created_by
+            return self._authors_cache
         except AttributeError:
-            return None
-
-    def slug(self):
-        return slugify(self.title, allow_unicode=True)
+            return list(Member.objects.filter(version_contribution__parent_article=self).distinct())
+
+    def record_version(self, version, rewritten=False):
+        """
+        Makes a version the current version and updates the edit statistics, within the transaction saving the version
+
+        Only the changed columns are updated. If the version has a base_version_id, the update is conditional on it
+        still being the current version, and EditConflict is raised otherwise.
+        """
+        articles = Article.objects.filter(pk=self.pk)
+        current = articles if version.base_version_id is None else articles.filter(
+            current_version_id=version.base_version_id)
+        updated_at = timezone.now()
+        # Also locks the article, so that concurrent versions by the same new author only count it once
+        if not current.update(current_version=version, updated_at=updated_at, last_edited_by_id=version.created_by_id,
+                              last_edited_at=version.created_at):
+            raise EditConflict(articles.values_list('current_version_id', flat=True).first())
+
+        versions = ArticleVersion.objects.filter(parent_article_id=self.pk)
+        if rewritten:
+            statistics = versions.aggregate(version_count=Count('pk'), author_count=Count('created_by', distinct=True))
+        else:
+            new_author = not versions.filter(created_by_id=version.created_by_id).exclude(pk=version.pk).exists()
+            statistics = {'version_count': F('version_count') + 1, 'author_count': F('author_count') + int(new_author)}
+        articles.update(**statistics)
+
+        self.current_version = version
+        self.updated_at = updated_at
+        self._loaded_values = dict(getattr(self, '_loaded_values', {}), current_version_id=version.pk)
+        self.refresh_from_db(fields=self.STATISTICS_FIELDS)
+        get_search_backend().index(self)
+        self.invalidate_representations()
 
     # Ensure that a article never has a 'current_version' that does not belong to that article
     def save(self, *args, **kwargs):
         if self.current_version:
             if self.pk != self.current_version.parent_article.pk:
                 raise AttributeError(_('Cannot only assign versions that belongs to this article as current_version'))
+        # The statistics are only written by update(), so that an outdated instance never overwrites them. Neither is
+        # the current version, which record_version() sets, unless it was changed on this instance.
+        loaded_values = getattr(self, '_loaded_values', {})
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            excluded = set(self.STATISTICS_FIELDS)
+            if 'current_version_id' in loaded_values and loaded_values['current_version_id'] == self.current_version_id:
+                excluded.add('current_version')
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in excluded]
         super(Article, self).save(*args, **kwargs)
+        # The search index is updated with the current version in the database, which may be newer than this one's
+        if kwargs.get('update_fields') is not None and 'current_version' not in kwargs['update_fields']:
+            self.refresh_from_db(fields=['current_version'])
+        self._loaded_values = dict(loaded_values, current_version_id=self.current_version_id)
+        get_search_backend().index(self)
+        self.invalidate_representations()
+
+    def invalidate_representations(self):
+        loaded_values = getattr(self, '_loaded_values', {})
+        representation_cache.invalidate('article', self.pk)
+        representation_cache.invalidate('category', self.category_id)
+        if loaded_values.get('category_id') != self.category_id:
+            representation_cache.invalidate('category', loaded_values.get('category_id'))
+        # The versions show the access of their article
+        if loaded_values.get('access', self.access) != self.access:
+            representation_cache.invalidate('article_version', *self.versions.values_list('pk', flat=True))
+        self._loaded_values = dict(loaded_values, category_id=self.category_id, access=self.access)
+
+    def delete(self, *args, **kwargs):
+        article_id, category_id = self.pk, self.category_id
+        version_ids = list(self.versions.values_list('pk', flat=True))
+        deleted = super(Article, self).delete(*args, **kwargs)
+        get_search_backend().remove(article_id)
+        representation_cache.invalidate('article', article_id)
+        representation_cache.invalidate('category', category_id)
+        representation_cache.invalidate('article_version', *version_ids)
+        return deleted
 
     def __unicode__(self):
         return self.title
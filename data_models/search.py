@@ -0,0 +1,176 @@
+from django.db import connection
+
+
+TABLE = 'data_models_article_search'
+
+
+class SearchBackend(object):
+    """
+    Full-text index over the title and current content of every article
+
+    Rows are keyed by article id, and updated whenever an article is saved.
+    """
+
+    def create(self, cursor):
+        pass
+
+    def drop(self, cursor):
+        pass
+
+    def index(self, article):
+        pass
+
+    def remove(self, article_id):
+        pass
+
+    def search(self, query, articles, limit):
+        """
+        Returns the articles from the given queryset that match the query, best matches first
+        """
+        raise NotImplementedError
+
+    def rebuild(self, articles):
+        """
+        Recreates the index from the given queryset of articles
+        """
+        from .export import queryset_chunks
+
+        with connection.cursor() as cursor:
+            self.drop(cursor)
+            self.create(cursor)
+        for chunk in queryset_chunks(articles.select_related('current_version')):
+            for article in chunk:
+                self.index(article)
+
+    @staticmethod
+    def document(article):
+        content = article.current_version.content if article.current_version_id else ''
+        return article.title, content
+
+    @staticmethod
+    def in_order(articles, ids):
+        articles = articles.in_bulk(ids)
+        return [articles[id] for id in ids if id in articles]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Search backend using an SQLite FTS5 virtual table, where the rowid is the article id
+    """
+
+    def create(self, cursor):
+        cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(title, content)'.format(table=TABLE))
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS {table}'.format(table=TABLE))
+
+    def index(self, article):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table} WHERE rowid = %s'.format(table=TABLE), [article.pk])
+            cursor.execute('INSERT INTO {table} (rowid, title, content) VALUES (%s, %s, %s)'.format(table=TABLE),
+                           [article.pk] + list(self.document(article)))
+
+    def remove(self, article_id):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table} WHERE rowid = %s'.format(table=TABLE), [article_id])
+
+    # Every word of the query has to match, and is quoted so that it is never parsed as FTS5 syntax
+    @staticmethod
+    def match_expression(query):
+        return ' '.join('"{word}"'.format(word=word.replace('"', '""')) for word in query.split())
+
+    def search(self, query, articles, limit):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        article_ids, params = articles.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM {table} WHERE {table} MATCH %s AND rowid IN ({article_ids}) '
+                'ORDER BY rank LIMIT %s'.format(table=TABLE, article_ids=article_ids),
+                [match] + list(params) + [limit]
+            )
+            return self.in_order(articles, [row[0] for row in cursor.fetchall()])
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """
+    Search backend using a table of tsvector documents with a GIN index
+    """
+
+    def create(self, cursor):
+        cursor.execute('CREATE TABLE IF NOT EXISTS {table} ('
+                       'article_id integer PRIMARY KEY, document tsvector NOT NULL)'.format(table=TABLE))
+        cursor.execute('CREATE INDEX IF NOT EXISTS {table}_document ON {table} USING gin(document)'.format(
+            table=TABLE))
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS {table}'.format(table=TABLE))
+
+    def index(self, article):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table} WHERE article_id = %s'.format(table=TABLE), [article.pk])
+            cursor.execute(
+                'INSERT INTO {table} (article_id, document) '
+                'VALUES (%s, setweight(to_tsvector(%s), \'A\') || to_tsvector(%s))'.format(table=TABLE),
+                [article.pk] + list(self.document(article))
+            )
+
+    def remove(self, article_id):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table} WHERE article_id = %s'.format(table=TABLE), [article_id])
+
+    def search(self, query, articles, limit):
+        if not query.split():
+            return []
+        article_ids, params = articles.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT article_id FROM {table} WHERE document @@ plainto_tsquery(%s) '
+                'AND article_id IN ({article_ids}) '
+                'ORDER BY ts_rank(document, plainto_tsquery(%s)) DESC LIMIT %s'.format(
+                    table=TABLE, article_ids=article_ids),
+                [query] + list(params) + [query, limit]
+            )
+            return self.in_order(articles, [row[0] for row in cursor.fetchall()])
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Fallback for other databases, which scans the articles without an index
+
+    The content is stored compressed, so it is matched after it has been read.
+    """
+
+    def rebuild(self, articles):
+        pass
+
+    def search(self, query, articles, limit):
+        words = [word.lower() for word in query.split()]
+        if not words:
+            return []
+        matches = []
+        for article in articles.select_related('current_version').order_by('-updated_at').iterator():
+            document = ' '.join(self.document(article)).lower()
+            if all(word in document for word in words):
+                matches.append(article)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, DatabaseSearchBackend)()
+
+
+def search_articles(query, articles, limit=20):
+    """
+    Returns the articles from the given queryset matching every word of the query, best matches first
+    """
+    return get_search_backend().search(query, articles, limit)
@@ -0,0 +1,139 @@
+import re
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+class TitleSlugField(models.SlugField):
+    """
+    Unique slug of the title of the model, kept up to date whenever the model is saved, and by bulk_create() of a
+    TitleSlugQuerySet
+
+    Titles with the same slug get '-2', '-3' and so on appended to it, in the order they are saved. The slug only
+    changes when the title changes, so that links stay the same.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.populate_from = kwargs.pop('populate_from', 'title')
+        kwargs.setdefault('max_length', 140)
+        kwargs.setdefault('unique', True)
+        kwargs.setdefault('allow_unicode', True)
+        kwargs.setdefault('editable', False)
+        super(TitleSlugField, self).__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(TitleSlugField, self).deconstruct()
+        # Field.deconstruct() leaves out unique=False, which is not the default here
+        if not self._unique:
+            kwargs['unique'] = False
+        if self.populate_from != 'title':
+            kwargs['populate_from'] = self.populate_from
+        return name, path, args, kwargs
+
+    def base_slug(self, model_instance):
+        # Leaves room for the number added to slugs that are taken
+        base = slugify(getattr(model_instance, self.populate_from), allow_unicode=True)[:self.max_length - 11]
+        return base.strip('-') or model_instance._meta.model_name
+
+    @staticmethod
+    def is_slug_of(slug, base):
+        return bool(slug) and re.match(r'^{base}(-\d+)?$'.format(base=re.escape(base)), slug) is not None
+
+    def pre_save(self, model_instance, add):
+        slug = getattr(model_instance, self.attname)
+        base = self.base_slug(model_instance)
+        if not self.is_slug_of(slug, base):
+            slug = self.unique_slug(model_instance, base)
+            setattr(model_instance, self.attname, slug)
+        return slug
+
+    def taken_slugs(self, queryset, base):
+        """
+        Returns the slugs of the queryset that are the base, or the base followed by a number
+        """
+        # Slugs only hold word characters and hyphens, which have no special meaning in regular expressions
+        numbered = '^{base}-[0-9]+$'.format(base=base)
+        return set(queryset.filter(Q(**{self.attname: base}) | Q(**{self.attname + '__regex': numbered}))
+                   .values_list(self.attname, flat=True))
+
+    @staticmethod
+    def first_free_slug(base, taken):
+        slug, number = base, 1
+        while slug in taken:
+            number += 1
+            slug = '{base}-{number}'.format(base=base, number=number)
+        return slug
+
+    def unique_slug(self, model_instance, base):
+        others = model_instance.__class__._default_manager.all()
+        if model_instance.pk is not None:
+            others = others.exclude(pk=model_instance.pk)
+        return self.first_free_slug(base, self.taken_slugs(others, base))
+
+    def populate_slugs(self, model_instances):
+        """
+        Gives unsaved instances unique slugs, also among themselves, before they are created together
+
+        Whether the bases are taken is looked up in one query, and the numbers taken of those that are one query each.
+        """
+        unassigned = []
+        assigned = set()
+        for model_instance in model_instances:
+            slug = getattr(model_instance, self.attname)
+            base = self.base_slug(model_instance)
+            if self.is_slug_of(slug, base) and slug not in assigned:
+                assigned.add(slug)
+            else:
+                unassigned.append((model_instance, base))
+        if not unassigned:
+            return
+        queryset = self.model._default_manager.all()
+        taken_bases = queryset.filter(**{self.attname + '__in': set(base for _, base in unassigned)}).values_list(
+            self.attname, flat=True)
+        taken = {base: self.taken_slugs(queryset, base) for base in taken_bases}
+        for model_instance, base in unassigned:
+            slug = self.first_free_slug(base, taken.get(base, set()) | assigned)
+            setattr(model_instance, self.attname, slug)
+            assigned.add(slug)
+
+
+def slug_fields(model):
+    return [field for field in model._meta.concrete_model._meta.local_fields if isinstance(field, TitleSlugField)]
+
+
+class TitleSlugQuerySet(models.QuerySet):
+    """
+    Gives the objects created by bulk_create() unique slugs, which pre_save() cannot do within one batch
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for field in slug_fields(self.model):
+            field.populate_slugs(objs)
+        return super(TitleSlugQuerySet, self).bulk_create(objs, *args, **kwargs)
+
+
+class TitleSlugMixin(object):
+    """
+    Saves the model again with a new slug if a concurrent save took the slug after it was chosen
+    """
+    SLUG_ATTEMPTS = 3
+
+    def save(self, *args, **kwargs):
+        for attempt in range(1, self.SLUG_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    return super(TitleSlugMixin, self).save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == self.SLUG_ATTEMPTS or not self.slug_taken():
+                    raise
+                for field in slug_fields(self):
+                    setattr(self, field.attname, '')
+
+    def slug_taken(self):
+        others = self._meta.concrete_model._default_manager.all()
+        if self.pk is not None:
+            others = others.exclude(pk=self.pk)
+        return any(others.filter(**{field.attname: getattr(self, field.attname)}).exists()
+                   for field in slug_fields(self))
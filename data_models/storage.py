@@ -0,0 +1,165 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+from diff_match_patch import diff_match_patch
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# The first byte of a stored text tells how the rest of it is stored
+PLAIN = b'\x00'
+ZLIB = b'\x01'
+ZSTD = b'\x02'
+
+
+def delta_storage_enabled():
+    return getattr(settings, 'ARTICLE_VERSION_DELTA_STORAGE', False)
+
+
+def keyframe_interval():
+    return getattr(settings, 'ARTICLE_VERSION_KEYFRAME_INTERVAL', 16)
+
+
+def compression():
+    return getattr(settings, 'ARTICLE_VERSION_COMPRESSION', 'zlib')
+
+
+def compression_threshold():
+    return getattr(settings, 'ARTICLE_VERSION_COMPRESSION_THRESHOLD', 512)
+
+
+def compress(data, algorithm):
+    if algorithm == 'zlib':
+        return ZLIB + zlib.compress(data)
+    if algorithm == 'zstd':
+        if zstandard is None:
+            raise ImproperlyConfigured('Compressing with zstd requires the zstandard package')
+        return ZSTD + zstandard.ZstdCompressor().compress(data)
+    raise ImproperlyConfigured('Unknown compression {algorithm!r}'.format(algorithm=algorithm))
+
+
+def encode_text(text, algorithm=None, threshold=None):
+    """
+    Returns the stored form of a text, compressed with the configured algorithm if it is at least threshold bytes
+    and compression makes it smaller
+    """
+    algorithm = compression() if algorithm is None else algorithm
+    threshold = compression_threshold() if threshold is None else threshold
+    data = text.encode('utf-8')
+    if algorithm and len(data) >= threshold:
+        compressed = compress(data, algorithm)
+        if len(compressed) < len(data) + 1:
+            return compressed
+    return PLAIN + data
+
+
+def decode_text(value):
+    """
+    Returns the text of a stored value, which may also be text that has not been stored yet
+    """
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    flag, data = value[:1], value[1:]
+    if flag == ZLIB:
+        data = zlib.decompress(data)
+    elif flag == ZSTD:
+        if zstandard is None:
+            raise ImproperlyConfigured('Reading texts compressed with zstd requires the zstandard package')
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data.decode('utf-8')
+
+
+def make_patch(base, content):
+    """
+    Returns the patch, in the text format of diff_match_patch, that turns base into content
+    """
+    dmp = diff_match_patch()
+    return dmp.patch_toText(dmp.patch_make(base, content))
+
+
+def apply_patch(base, patch):
+    dmp = diff_match_patch()
+    return dmp.patch_apply(dmp.patch_fromText(patch), base)[0]
+
+
+class VersionContent(property):
+    """
+    The full text of an article version, read and written through get_content() and set_content() of the model
+    """
+
+    def __init__(self):
+        super(VersionContent, self).__init__(lambda version: version.get_content(),
+                                             lambda version, content: version.set_content(content))
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Text field stored as a flag byte and the UTF-8 encoded text, compressed if it is large enough (see encode_text)
+
+    Values loaded from the database stay in their stored form until decode_text() is called on them, so texts that
+    are never read are never decompressed. Text assigned to the field is encoded when it is saved.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CompressedTextField, self).__init__(*args, **kwargs)
+        # BinaryField is never editable
+        self.editable = True
+
+    # Skips BinaryField.deconstruct(), which expects the field to be non-editable
+    def deconstruct(self):
+        return models.Field.deconstruct(self)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, str):
+            value = encode_text(value)
+        return super(CompressedTextField, self).get_db_prep_value(value, connection, prepared)
+
+    def from_db_value(self, value, expression, connection, context):
+        if isinstance(value, memoryview):
+            return bytes(value)
+        return value
+
+    def to_python(self, value):
+        return value
+
+    def value_to_string(self, obj):
+        return decode_text(self.value_from_object(obj))
+
+
+class VersionContentMixin(object):
+    """
+    Field holding either the content of an article version or a patch against another version
+
+    The stored value is the attribute 'stored_content', while 'content' is the full text. The field keeps the name
+    and column 'content', and serializes the full text, so dumps are the same with and without delta storage.
+    """
+
+    def get_attname(self):
+        return 'stored_{name}'.format(name=self.name)
+
+    def get_attname_column(self):
+        return self.get_attname(), self.db_column or self.name
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super(VersionContentMixin, self).contribute_to_class(cls, name, **kwargs)
+        setattr(cls, name, VersionContent())
+
+    def value_from_object(self, obj):
+        return getattr(obj, self.name)
+
+
+class VersionContentField(VersionContentMixin, models.TextField):
+    """
+    The uncompressed content field, used by the migrations before compression
+    """
+
+
+class CompressedVersionContentField(VersionContentMixin, CompressedTextField):
+    pass
@@ -1,3 +1,593 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+
+from . import diffs
+from .cache import comparison_cache
+from .diffs import process_diff
+from .export import export_ndjson
+from .importer import Importer
+from .models import Article, ArticleVersion, Category, EditConflict, Member
+from .search import DatabaseSearchBackend, search_articles
+from .slugs import TitleSlugField
+from .storage import PLAIN, ZLIB, ZSTD, zstandard
+
+
+@override_settings(ARTICLE_VERSION_DIFFS={'BACKEND': 'data_models.diffs.ImmediateDiffBackend'})
+class ArticleVersionDiffTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com', 'password')
+        self.category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Article', category=self.category, created_by=self.member)
+
+    def create_version(self, content):
+        return ArticleVersion.objects.create(content=content, parent_article=self.article, created_by=self.member)
+
+    def test_diff_is_stored_on_save(self):
+        self.create_version('Hello world')
+        version = self.create_version('Hello wiki')
+        stored = ArticleVersion.objects.get(pk=version.pk)
+        self.assertIsNotNone(stored.stored_diff)
+        with self.assertNumQueries(0):
+            diff = stored.diff()
+        self.assertEqual(''.join(d['text'] for d in diff if d['type'] >= 0), 'Hello wiki')
+
+    def test_missing_diff_is_computed_on_first_read(self):
+        self.create_version('Hello world')
+        version = self.create_version('Hello wiki')
+        ArticleVersion.objects.filter(pk=version.pk).update(stored_diff=None)
+        stored = ArticleVersion.objects.get(pk=version.pk)
+        self.assertEqual(stored.diff(), version.diff())
+        self.assertIsNotNone(ArticleVersion.objects.get(pk=version.pk).stored_diff)
+
+    def test_deleting_a_version_invalidates_the_next_diff(self):
+        self.create_version('Hello world')
+        middle = self.create_version('Hello wiki')
+        last = self.create_version('Hello wiki!')
+        middle.delete()
+        self.assertEqual(ArticleVersion.objects.get(pk=last.pk).diff(),
+                         [{'type': 0, 'text': 'Hello w'}, {'type': -1, 'text': 'orld'},
+                          {'type': 1, 'text': 'iki!'}])
+
+    def test_diff_is_against_previous_version_of_same_article(self):
+        self.create_version('Hello world')
+        other_article = Article.objects.create(title='Other', category=self.category, created_by=self.member)
+        ArticleVersion.objects.create(content='Something else', parent_article=other_article, created_by=self.member)
+        version = self.create_version('Hello wiki')
+        self.assertEqual(version.diff(), [{'type': 0, 'text': 'Hello w'}, {'type': -1, 'text': 'orld'},
+                                          {'type': 1, 'text': 'iki'}])
+
+
+class DiffModeTests(TestCase):
+    old = ''.join('Line {i}\n'.format(i=i) for i in range(1, 21))
+    new = old.replace('Line 3\n', 'Line three\n').replace('Line 15\n', 'Line fifteen\n')
+
+    def test_modes_never_split_their_units(self):
+        self.assertIn([-1, '3'], diffs.compute_diff(self.old, self.new, diffs.CHAR))
+        self.assertIn([-1, '3'], diffs.compute_diff('Line 3 is here', 'Line three is here', diffs.WORD))
+        self.assertNotIn([-1, 'e'], diffs.compute_diff('Line one', 'Line none', diffs.WORD))
+        self.assertIn([-1, 'Line 3\n'], diffs.compute_diff(self.old, self.new, diffs.LINE))
+        self.assertIn([1, 'Line three\n'], diffs.compute_diff(self.old, self.new, diffs.LINE))
+
+    def test_context_hunks(self):
+        hunks = diffs.context_hunks(diffs.compute_diff(self.old, self.new, diffs.LINE), 1)
+        self.assertEqual(hunks, [
+            {'old_start': 2, 'new_start': 2, 'diff': [
+                {'type': 0, 'text': 'Line 2\n'}, {'type': -1, 'text': 'Line 3\n'},
+                {'type': 1, 'text': 'Line three\n'}, {'type': 0, 'text': 'Line 4\n'}]},
+            {'old_start': 14, 'new_start': 14, 'diff': [
+                {'type': 0, 'text': 'Line 14\n'}, {'type': -1, 'text': 'Line 15\n'},
+                {'type': 1, 'text': 'Line fifteen\n'}, {'type': 0, 'text': 'Line 16\n'}]},
+        ])
+
+    def test_context_around_changes_within_lines(self):
+        hunks = diffs.context_hunks(diffs.compute_diff(self.old, self.new, diffs.CHAR), 0)
+        self.assertEqual([(hunk['old_start'], ''.join(segment['text'] for segment in hunk['diff']
+                                                      if segment['type'] >= 0)) for hunk in hunks],
+                         [(3, 'Line three\n'), (15, 'Line fifteen\n')])
+
+    @override_settings(ARTICLE_VERSION_DIFFS={'BACKEND': 'data_models.diffs.QueueDiffBackend'})
+    def test_rewriting_a_version_clears_the_comparisons(self):
+        member = Member.objects.create_user('member', 'member@example.com')
+        article = Article.objects.create(title='Article', category=Category.objects.create(title='Category'),
+                                         created_by=member)
+        old = ArticleVersion.objects.create(content=self.old, parent_article=article, created_by=member)
+        new = ArticleVersion.objects.create(content=self.new, parent_article=article, created_by=member)
+        comparison_cache.clear()
+        self.assertEqual(len(diffs.compare_versions(old, new, diffs.LINE, 0)), 2)
+        new.content = self.old
+        new.save()
+        self.assertEqual(diffs.compare_versions(old, new, diffs.LINE, 0), [])
+
+    def test_close_changes_share_a_hunk(self):
+        hunks = diffs.context_hunks(diffs.compute_diff(self.old, self.new, diffs.LINE), 6)
+        self.assertEqual(len(hunks), 1)
+        self.assertEqual((hunks[0]['old_start'], hunks[0]['diff'][-1]['text']), (1, 'Line 16\nLine 17\nLine 18\n'
+                                                                                    'Line 19\nLine 20\n'))
+
+
+@override_settings(ARTICLE_VERSION_DIFFS={'BACKEND': 'data_models.diffs.QueueDiffBackend'})
+class DiffQueueTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        self.article = Article.objects.create(title='Article', category=Category.objects.create(title='Category'),
+                                              created_by=self.member)
+
+    def create_version(self, content):
+        return ArticleVersion.objects.create(content=content, parent_article=self.article, created_by=self.member)
+
+    def test_diffs_are_pending_until_computed(self):
+        self.create_version('Hello world')
+        version = self.create_version('Hello wiki')
+        self.assertEqual(ArticleVersion.objects.get(pk=version.pk).diff_status, ArticleVersion.DIFF_STATUS.PENDING)
+
+        call_command('compute_diffs', stdout=io.StringIO())
+        stored = ArticleVersion.objects.get(pk=version.pk)
+        self.assertEqual(stored.diff_status, ArticleVersion.DIFF_STATUS.READY)
+        self.assertEqual(stored.diff(), [{'type': 0, 'text': 'Hello w'}, {'type': -1, 'text': 'orld'},
+                                         {'type': 1, 'text': 'iki'}])
+
+    def test_compute_diffs_reports_skipped_versions_apart_from_failed_ones(self):
+        versions = [self.create_version(content) for content in ('Hello world', 'Hello wiki', 'Hello wiki!')]
+        stdout = io.StringIO()
+        with mock.patch('data_models.management.commands.compute_diffs.process_diff', side_effect=[True, None, False]):
+            call_command('compute_diffs', stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), 'Stored diffs for 1 article versions, skipped 1 that were ready '
+                                                    'or invalidated, 1 failed')
+        self.assertTrue(process_diff(versions[0].pk))
+        self.assertIsNone(process_diff(versions[0].pk))
+
+    def test_recomputing_all_diffs_invalidates_those_being_computed(self):
+        version = self.create_version('Hello world')
+        call_command('compute_diffs', stdout=io.StringIO())
+        computing = ArticleVersion.objects.get(pk=version.pk)
+        call_command('compute_diffs', all=True, stdout=io.StringIO())
+        self.assertEqual(ArticleVersion.objects.get(pk=version.pk).diff_generation, computing.diff_generation + 1)
+        self.assertFalse(computing.store_diff())
+
+    def test_deleting_a_version_queues_the_next_diff(self):
+        self.create_version('Hello world')
+        middle = self.create_version('Hello wiki')
+        last = self.create_version('Hello wiki!')
+        call_command('compute_diffs', stdout=io.StringIO())
+        middle.delete()
+        self.assertEqual(ArticleVersion.objects.get(pk=last.pk).diff_status, ArticleVersion.DIFF_STATUS.PENDING)
+
+    def test_diffs_invalidated_while_computed_are_not_stored(self):
+        self.create_version('Hello world')
+        middle = self.create_version('Hello wiki')
+        last = self.create_version('Hello wiki!')
+        computing = ArticleVersion.objects.get(pk=last.pk)
+        compute_diff = computing.compute_diff
+
+        # The version before it is deleted while the diff is computed against it, which queues the diff again
+        def compute_diff_while_deleting(*args, **kwargs):
+            diff = compute_diff(*args, **kwargs)
+            ArticleVersion.objects.get(pk=middle.pk).delete()
+            return diff
+
+        computing.compute_diff = compute_diff_while_deleting
+        self.assertFalse(computing.store_diff())
+        self.assertEqual(ArticleVersion.objects.get(pk=last.pk).diff_status, ArticleVersion.DIFF_STATUS.PENDING)
+        self.assertTrue(process_diff(last.pk))
+        self.assertEqual(ArticleVersion.objects.get(pk=last.pk).diff(), [{'type': 0, 'text': 'Hello w'},
+                                                                          {'type': -1, 'text': 'orld'},
+                                                                          {'type': 1, 'text': 'iki!'}])
+
+    def test_failing_diffs_are_marked_as_failed(self):
+        version = self.create_version('Hello world')
+        with mock.patch.object(ArticleVersion, 'compute_diff', side_effect=RuntimeError), \
+                self.assertLogs('data_models.diffs', 'ERROR'):
+            self.assertFalse(process_diff(version.pk))
+        self.assertEqual(ArticleVersion.objects.get(pk=version.pk).diff_status, ArticleVersion.DIFF_STATUS.FAILED)
+
+    def test_pending_diffs_are_enqueued_when_read(self):
+        self.create_version('Hello world')
+        version = self.create_version('Hello wiki')
+        self.assertIsNone(ArticleVersion.objects.get(pk=version.pk).ready_diff())
+        with override_settings(ARTICLE_VERSION_DIFFS={'BACKEND': 'data_models.diffs.ImmediateDiffBackend'}):
+            self.assertEqual(ArticleVersion.objects.get(pk=version.pk).ready_diff(),
+                             [{'type': 0, 'text': 'Hello w'}, {'type': -1, 'text': 'orld'}, {'type': 1, 'text': 'iki'}])
+        self.assertEqual(ArticleVersion.objects.get(pk=version.pk).diff_status, ArticleVersion.DIFF_STATUS.READY)
+
+    def test_thread_pool_queues_a_version_once_until_started(self):
+        backend = diffs.ThreadPoolDiffBackend(max_workers=1)
+        backend.executor = mock.Mock()
+        backend.submit(1)
+        backend.submit(1)
+        backend.submit(2)
+        self.assertEqual([call[0][1] for call in backend.executor.submit.call_args_list], [1, 2])
+        with mock.patch.object(diffs, 'process_diff'), mock.patch.object(diffs, 'connection'):
+            backend.run(1)
+        backend.submit(1)
+        self.assertEqual(backend.executor.submit.call_count, 3)
+
+
+class AuthorsAndContributionsTests(TestCase):
+    def setUp(self):
+        self.members = [Member.objects.create_user('member{i}'.format(i=i), 'member{i}@example.com'.format(i=i))
+                        for i in range(2)]
+        category = Category.objects.create(title='Category')
+        self.articles = [Article.objects.create(title='Article {i}'.format(i=i), category=category,
+                                                created_by=self.members[0]) for i in range(2)]
+        for member in self.members + self.members:
+            ArticleVersion.objects.create(content='Content', parent_article=self.articles[0], created_by=member)
+        ArticleVersion.objects.create(content='Content', parent_article=self.articles[1], created_by=self.members[0])
+
+    def test_authors_are_distinct(self):
+        self.assertEqual(sorted(self.articles[0].authors(), key=lambda m: m.pk), self.members)
+        self.assertEqual(self.articles[1].authors(), [self.members[0]])
+
+    def test_attach_authors_resolves_all_articles_at_once(self):
+        articles = list(Article.objects.filter(pk__in=[a.pk for a in self.articles]))
+        with self.assertNumQueries(2):
+            Article.objects.attach_authors(articles)
+        with self.assertNumQueries(0):
+            self.assertEqual(sum(len(article.authors()) for article in articles), 3)
+
+    def test_attach_contributions_by_article_resolves_all_members_at_once(self):
+        members = list(Member.objects.order_by('pk'))
+        with self.assertNumQueries(2):
+            Member.objects.attach_contributions_by_article(members)
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(members[0].contributions_by_article(), key=lambda a: a.pk), self.articles)
+            self.assertEqual(members[1].contributions_by_article(), [self.articles[0]])
+
+
+class ArticleStatisticsTests(TestCase):
+    def setUp(self):
+        self.members = [Member.objects.create_user('member{i}'.format(i=i), 'member{i}@example.com'.format(i=i))
+                        for i in range(2)]
+        category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Article', category=category, created_by=self.members[0])
+
+    def create_version(self, member):
+        return ArticleVersion.objects.create(content='Content', parent_article=self.article, created_by=member)
+
+    def assert_statistics(self, version_count, author_count, last_version):
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual((article.version_count, article.author_count), (version_count, author_count))
+        self.assertEqual(article.last_edited_by_id, last_version.created_by_id)
+        self.assertEqual(article.last_edited_at, last_version.created_at)
+
+    def test_new_versions_update_the_statistics(self):
+        self.assert_statistics(1, 1, self.create_version(self.members[0]))
+        self.assert_statistics(2, 1, self.create_version(self.members[0]))
+        last_version = self.create_version(self.members[1])
+        self.assert_statistics(3, 2, last_version)
+        self.assertEqual((self.article.version_count, self.article.author_count), (3, 2))
+
+    def test_deleting_a_version_recomputes_the_statistics(self):
+        first = self.create_version(self.members[0])
+        self.create_version(self.members[1])
+        self.create_version(self.members[0])
+        Article.objects.get(pk=self.article.pk).versions.get(created_by=self.members[1]).delete()
+        self.assert_statistics(2, 1, Article.objects.get(pk=self.article.pk).current_version)
+        self.assertEqual(Article.objects.get(pk=self.article.pk).versions.first(), first)
+
+    def test_saving_an_outdated_article_keeps_the_statistics(self):
+        outdated = Article.objects.get(pk=self.article.pk)
+        version = self.create_version(self.members[0])
+        outdated.title = 'Renamed'
+        outdated.save()
+        self.assert_statistics(1, 1, version)
+        self.assertEqual(Article.objects.get(pk=self.article.pk).current_version_id, version.pk)
+        self.assertEqual(outdated.current_version_id, version.pk)
+
+    def test_update_statistics_repairs_drift(self):
+        version = self.create_version(self.members[0])
+        Article.objects.filter(pk=self.article.pk).update(version_count=5, author_count=0, last_edited_by=None)
+        self.assertEqual(Article.objects.update_statistics(), 1)
+        self.assert_statistics(1, 1, version)
+        self.assertEqual(Article.objects.update_statistics(), 0)
+
+
+class EditConflictTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        self.article = Article.objects.create(title='Article', category=Category.objects.create(title='Category'),
+                                              created_by=self.member)
+        self.base = ArticleVersion.objects.create(content='Base', parent_article=self.article, created_by=self.member)
+
+    def create_version(self, content, base_version_id):
+        version = ArticleVersion(content=content, parent_article=Article.objects.get(pk=self.article.pk),
+                                 created_by=self.member)
+        version.base_version_id = base_version_id
+        version.save()
+        return version
+
+    def test_edit_based_on_an_old_version_is_refused(self):
+        first = self.create_version('First edit', self.base.pk)
+        with self.assertRaises(EditConflict) as conflict:
+            self.create_version('Second edit', self.base.pk)
+        self.assertEqual(conflict.exception.current_version_id, first.pk)
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual((article.current_version_id, article.version_count), (first.pk, 2))
+        self.assertEqual([version.content for version in article.versions.order_by('created_at')],
+                         ['Base', 'First edit'])
+
+    def test_new_version_only_updates_the_changed_columns(self):
+        self.article.title = 'Not saved'
+        updated_at = Article.objects.get(pk=self.article.pk).updated_at
+        version = ArticleVersion.objects.create(content='Edit', parent_article=self.article, created_by=self.member)
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual((article.title, article.current_version_id), ('Article', version.pk))
+        self.assertGreater(article.updated_at, updated_at)
+        self.assertEqual(search_articles('edit', Article.objects.all()), [article])
+
+
+@override_settings(ARTICLE_VERSION_DELTA_STORAGE=True, ARTICLE_VERSION_KEYFRAME_INTERVAL=3)
+class DeltaStorageTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Article', category=category, created_by=self.member)
+        self.contents = ['A paragraph of a rather long article.\n' * 20 + 'Edit {n}'.format(n=n) for n in range(7)]
+        self.versions = [ArticleVersion.objects.create(content=content, parent_article=self.article,
+                                                       created_by=self.member) for content in self.contents]
+
+    def stored(self):
+        return list(ArticleVersion.objects.filter(parent_article=self.article).order_by('created_at'))
+
+    def assert_contents(self, contents):
+        self.assertEqual([version.content for version in self.stored()], contents)
+
+    def test_versions_are_stored_as_patches_between_keyframes(self):
+        self.assertEqual([version.delta_base is None for version in self.stored()],
+                         [True, False, False, True, False, False, True])
+        self.assert_contents(self.contents)
+
+    def test_reading_a_version_applies_fewer_patches_than_the_interval(self):
+        version = ArticleVersion.objects.get(pk=self.versions[1].pk)
+        with self.assertNumQueries(2):
+            self.assertEqual(version.content, self.contents[1])
+
+    def test_rewriting_and_deleting_keep_the_other_versions(self):
+        version = ArticleVersion.objects.get(pk=self.versions[2].pk)
+        version.content = 'Rewritten'
+        version.save()
+        ArticleVersion.objects.get(pk=self.versions[5].pk).delete()
+        contents = self.contents[:2] + ['Rewritten'] + self.contents[3:5] + self.contents[6:]
+        self.assert_contents(contents)
+
+    def test_deleting_a_keyframe_keeps_the_chains_shorter_than_the_interval(self):
+        ArticleVersion.objects.get(pk=self.versions[3].pk).delete()
+        for n in range(7, 10):
+            ArticleVersion.objects.create(content=self.contents[0] + ' {n}'.format(n=n), parent_article=self.article,
+                                          created_by=self.member)
+        versions = {version.pk: version for version in self.stored()}
+        for version in versions.values():
+            patches = 0
+            while version.delta_base is not None:
+                patches, version = patches + 1, versions[version.delta_base]
+            self.assertLess(patches, 3)
+
+    def test_attach_previous_versions_resolves_the_patches_together(self):
+        versions = list(ArticleVersion.objects.filter(pk__in=[self.versions[n].pk for n in (0, 1, 4)])
+                        .order_by('created_at'))
+        # The previous versions, then the bases of the patches one step at a time
+        with self.assertNumQueries(3):
+            ArticleVersion.objects.attach_previous_versions(versions)
+        with self.assertNumQueries(0):
+            self.assertEqual([version.content for version in versions], [self.contents[n] for n in (0, 1, 4)])
+            self.assertEqual([version.previous_version() and version.previous_version().content
+                              for version in versions], [None, self.contents[0], self.contents[3]])
+
+    def test_compact_stores_in_full_and_back(self):
+        self.assertEqual(ArticleVersion.objects.all().compact(delta=False), 4)
+        self.assertTrue(all(version.delta_base is None for version in self.stored()))
+        self.assertEqual(ArticleVersion.objects.all().compact(), 4)
+        self.assert_contents(self.contents)
+
+
+@override_settings(ARTICLE_VERSION_COMPRESSION_THRESHOLD=100)
+class CompressedContentTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Article', category=category, created_by=self.member)
+
+    def create_version(self, content):
+        return ArticleVersion.objects.create(content=content, parent_article=self.article, created_by=self.member)
+
+    def stored_flag(self, version):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT content FROM data_models_articleversion WHERE id = %s', [version.pk])
+            return bytes(cursor.fetchone()[0])[:1]
+
+    def test_only_large_content_is_compressed(self):
+        small = self.create_version('Small')
+        large = self.create_version('Large content. ' * 100)
+        self.assertEqual((self.stored_flag(small), self.stored_flag(large)), (PLAIN, ZLIB))
+        self.assertEqual(ArticleVersion.objects.get(pk=small.pk).content, 'Small')
+        self.assertEqual(ArticleVersion.objects.get(pk=large.pk).content, 'Large content. ' * 100)
+
+    def test_content_is_decompressed_when_read(self):
+        version = ArticleVersion.objects.get(pk=self.create_version('Large content. ' * 100).pk)
+        self.assertIsInstance(version.stored_content, bytes)
+        self.assertNotIn('_content', vars(version))
+        self.assertEqual(version.content, 'Large content. ' * 100)
+        self.assertIn('_content', vars(version))
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstd_compression(self):
+        with self.settings(ARTICLE_VERSION_COMPRESSION='zstd'):
+            version = self.create_version('Large content. ' * 100)
+        self.assertEqual(self.stored_flag(version), ZSTD)
+        self.assertEqual(ArticleVersion.objects.get(pk=version.pk).content, 'Large content. ' * 100)
+
+    def test_fallback_search_reads_compressed_content(self):
+        self.create_version('The studio is in the basement. ' * 10)
+        self.assertEqual(DatabaseSearchBackend().search('studio BASEMENT', Article.objects.all(), 10), [self.article])
+        self.assertEqual(DatabaseSearchBackend().search('attic', Article.objects.all(), 10), [])
+
+
+class ExportImportTests(TestCase):
+    def setUp(self):
+        member = Member.objects.create_user('member', 'member@example.com', 'password')
+        category = Category.objects.create(title='Category')
+        for i in range(3):
+            article = Article.objects.create(title='Article {i}'.format(i=i), category=category, created_by=member)
+            for content in ('First', 'Second'):
+                ArticleVersion.objects.create(content=content, parent_article=article, created_by=member)
+
+    def snapshot(self):
+        return {
+            'members': list(Member.objects.values_list('username', 'password', 'date_joined').order_by('pk')),
+            'articles': list(Article.objects.values_list('title', 'current_version', 'created_at', 'updated_at')
+                             .order_by('pk')),
+            'versions': list(ArticleVersion.objects.values_list('content', 'parent_article', 'created_at')
+                             .order_by('pk')),
+        }
+
+    def test_import_restores_export(self):
+        snapshot = self.snapshot()
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as export_file:
+            export_file.writelines(export_ndjson(include_passwords=True, chunk_size=2))
+            export_file.flush()
+            Article.objects.update(current_version=None)
+            ArticleVersion.objects.all().delete()
+            Article.objects.all().delete()
+            Member.objects.all().delete()
+            Category.objects.all().delete()
+
+            importer = Importer(batch_size=2)
+            importer.run(export_file.name)
+
+        self.assertEqual(self.snapshot(), snapshot)
+        self.assertEqual(importer.created['data_models.articleversion'], 6)
+        self.assertEqual(set(ArticleVersion.objects.values_list('stored_diff', 'diff_status')),
+                         {(None, ArticleVersion.DIFF_STATUS.PENDING)})
+
+    def test_imported_versions_without_stored_diff_are_pending(self):
+        version = ArticleVersion.objects.first()
+        records = [{'model': 'data_models.articleversion', 'pk': version.pk + 100, 'fields': {
+            'content': 'Imported', 'parent_article': version.parent_article_id, 'created_by': version.created_by_id,
+            'created_at': '2016-06-01T12:00:00Z', 'diff_status': 'ready'}}]
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as fixture:
+            json.dump(records, fixture)
+            fixture.flush()
+            Importer().run(fixture.name)
+        self.assertEqual(ArticleVersion.objects.get(pk=version.pk + 100).diff_status,
+                         ArticleVersion.DIFF_STATUS.PENDING)
+
+    def test_rows_referring_to_missing_rows_are_refused(self):
+        version = ArticleVersion.objects.first()
+        records = [{'model': 'data_models.articleversion', 'pk': version.pk + 100, 'fields': {
+            'content': 'Imported', 'parent_article': version.parent_article_id + 100,
+            'created_by': version.created_by_id, 'created_at': '2016-06-01T12:00:00Z'}}]
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as fixture:
+            json.dump(records, fixture)
+            fixture.flush()
+            with self.assertRaises(IntegrityError):
+                Importer().run(fixture.name)
+        self.assertFalse(ArticleVersion.objects.filter(pk=version.pk + 100).exists())
+
+    def test_import_skips_existing_rows(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as export_file:
+            export_file.writelines(export_ndjson())
+            export_file.flush()
+            article = Article.objects.first()
+            newer = ArticleVersion.objects.create(content='Third', parent_article=article,
+                                                  created_by=article.created_by)
+            importer = Importer()
+            importer.run(export_file.name)
+        self.assertEqual(sum(importer.created.values()), 0)
+        self.assertEqual(importer.skipped['data_models.article'], 3)
+        # The exported current version is older than the one the article has got since
+        self.assertEqual(Article.objects.get(pk=article.pk).current_version_id, newer.pk)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        self.category = Category.objects.create(title='Category')
+        self.article = Article.objects.create(title='Radio', category=self.category, created_by=self.member)
+
+    def search(self, query, articles=None):
+        return search_articles(query, articles if articles is not None else Article.objects.all())
+
+    def test_index_follows_current_version(self):
+        ArticleVersion.objects.create(content='The studio is in the basement', parent_article=self.article,
+                                      created_by=self.member)
+        self.assertEqual(self.search('studio basement'), [self.article])
+        ArticleVersion.objects.create(content='The studio moved to the attic', parent_article=self.article,
+                                      created_by=self.member)
+        self.assertEqual(self.search('basement'), [])
+        self.assertEqual(self.search('attic'), [self.article])
+
+    def test_title_is_searchable(self):
+        self.assertEqual(self.search('radio'), [self.article])
+
+    def test_only_given_articles_are_returned(self):
+        self.assertEqual(self.search('radio', Article.objects.exclude(pk=self.article.pk)), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"radio OR'), [])
+
+    def test_deleted_article_is_removed_from_index(self):
+        self.article.delete()
+        self.assertEqual(self.search('radio'), [])
+
+
+class SlugTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create_user('member', 'member@example.com')
+        self.category = Category.objects.create(title='Blåbær & bringebær')
+
+    def create_article(self, title):
+        return Article.objects.create(title=title, category=self.category, created_by=self.member)
+
+    def test_slugs_are_stored_and_unique(self):
+        self.assertEqual(Category.objects.get(pk=self.category.pk).slug, 'blåbær-bringebær')
+        articles = [self.create_article(title) for title in ('Radio studio', 'Radio: Studio', 'Radio studio?!')]
+        self.assertEqual([Article.objects.get(pk=article.pk).slug for article in articles],
+                         ['radio-studio', 'radio-studio-2', 'radio-studio-3'])
+
+    def test_slug_only_changes_with_the_title(self):
+        self.create_article('Radio studio')
+        article = self.create_article('Radio: Studio')
+        article.access = Article.ACCESS.STAFF
+        article.save()
+        self.assertEqual(Article.objects.get(pk=article.pk).slug, 'radio-studio-2')
+        article.title = 'Workshop'
+        article.save()
+        self.assertEqual(Article.objects.get(pk=article.pk).slug, 'workshop')
+
+    def test_bulk_created_articles_get_slugs(self):
+        Article.objects.bulk_create([Article(title='Article {i}'.format(i=i), category=self.category,
+                                             created_by=self.member) for i in range(3)])
+        self.assertEqual(sorted(Article.objects.values_list('slug', flat=True)),
+                         ['article-0', 'article-1', 'article-2'])
+
+    def test_bulk_created_articles_get_unique_slugs_among_themselves(self):
+        self.create_article('Studio')
+        self.create_article('Studio 2')
+        Article.objects.bulk_create([Article(title=title, category=self.category, created_by=self.member)
+                                     for title in ('studio', 'STUDIO', 'Studio 2!')])
+        self.assertEqual(sorted(Article.objects.values_list('slug', flat=True)),
+                         ['studio', 'studio-2', 'studio-2-2', 'studio-3', 'studio-4'])
+
+    def test_slug_taken_by_a_concurrent_save_is_chosen_again(self):
+        self.create_article('Studio')
+        unique_slug = TitleSlugField.unique_slug
+        chosen = []
+
+        # The first slug is chosen before the other article with it is saved
+        def unique_slug_before_the_other_save(field, model_instance, base):
+            chosen.append(unique_slug(field, model_instance, base) if chosen else 'studio')
+            return chosen[-1]
+
+        with mock.patch.object(TitleSlugField, 'unique_slug', unique_slug_before_the_other_save):
+            article = self.create_article('Studio!')
+        self.assertEqual(chosen, ['studio', 'studio-2'])
+        self.assertEqual(Article.objects.get(pk=article.pk).slug, 'studio-2')
+
+    def test_titles_without_letters_get_a_slug(self):
+        self.assertEqual([self.create_article(title).slug for title in ('???', '!!!')], ['article', 'article-2'])
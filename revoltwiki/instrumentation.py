@@ -0,0 +1,198 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+# Literals are replaced, so that queries differing only in their parameters have the same fingerprint
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LIST_PATTERN = re.compile(r'\((?:\s*\?\s*,)*\s*\?\s*\)')
+
+PERCENTILES = (50, 90, 99)
+METRICS = ('wall_time', 'sql_time', 'sql_count', 'serialization_time')
+# Requests with other tags than the first INSTRUMENTATION_MAX_TAGS are recorded together with this tag
+OTHER_TAG = '<other>'
+
+
+def slow_request_time():
+    """
+    Returns the number of seconds after which a request is logged as slow, or None to never log requests
+    """
+    return getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_TIME', 1.0)
+
+
+def max_tags():
+    """
+    Returns how many tags are recorded separately, which bounds the memory used, since clients choose the names of
+    GraphQL operations
+    """
+    return getattr(settings, 'INSTRUMENTATION_MAX_TAGS', 100)
+
+
+def fingerprint(sql):
+    return LIST_PATTERN.sub('(...)', LITERAL_PATTERN.sub('?', sql))
+
+
+def percentile(ordered, percent):
+    """
+    Returns the value below which the given percent of the ordered values are (nearest rank)
+    """
+    index = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[index]
+
+
+class RequestMetrics(object):
+    """
+    What one request spent its time on, tagged with the endpoint that handled it
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.tag = None
+        self.wall_time = 0.0
+        self.serialization_time = 0.0
+        self.queries = []
+
+    @property
+    def sql_count(self):
+        return len(self.queries)
+
+    @property
+    def sql_time(self):
+        return sum(float(query['time']) for query in self.queries)
+
+    def fingerprints(self):
+        return Counter(fingerprint(query['sql']) for query in self.queries).most_common()
+
+
+class InstrumentationRecorder(object):
+    """
+    Keeps the metrics of the latest requests to each endpoint, and aggregates them to percentiles
+
+    Every process has its own recorder, like the LRU representation cache.
+    """
+
+    def __init__(self):
+        self.samples = OrderedDict()
+        self.lock = threading.Lock()
+
+    def record(self, metrics):
+        sample = tuple(getattr(metrics, name) for name in METRICS)
+        with self.lock:
+            tag = metrics.tag
+            if tag not in self.samples and len(self.samples) >= max_tags():
+                tag = OTHER_TAG
+            if tag not in self.samples:
+                self.samples[tag] = deque(maxlen=getattr(settings, 'INSTRUMENTATION_SAMPLES', 1000))
+            self.samples[tag].append(sample)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def stats(self):
+        with self.lock:
+            samples = {tag: list(endpoint_samples) for tag, endpoint_samples in self.samples.items()}
+        stats = OrderedDict()
+        for tag in sorted(samples):
+            endpoint_stats = OrderedDict([('count', len(samples[tag]))])
+            for index, name in enumerate(METRICS):
+                ordered = sorted(sample[index] for sample in samples[tag])
+                endpoint_stats[name] = OrderedDict(
+                    [('p{percent}'.format(percent=percent), percentile(ordered, percent)) for percent in PERCENTILES] +
+                    [('max', ordered[-1])])
+            stats[tag] = endpoint_stats
+        return stats
+
+
+recorder = InstrumentationRecorder()
+
+
+def tag_request(request, tag):
+    """
+    Tags the metrics of the request, if it is instrumented, with another name than that of its view
+    """
+    metrics = getattr(request, 'instrumentation', None)
+    if metrics is not None:
+        metrics.tag = tag
+
+
+@contextmanager
+def measure_serialization(request):
+    """
+    Adds the time spent in the block to the serialization time of the request, if it is instrumented
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = getattr(request, 'instrumentation', None)
+        if metrics is not None:
+            metrics.serialization_time += time.perf_counter() - started_at
+
+
+class InstrumentationMiddleware(object):
+    """
+    Records the number of SQL queries, the time spent on them, the serialization time and the wall time of each request
+
+    Requests are tagged by the name of their view, and GraphQL requests by their operation. Percentiles per tag are
+    shown at /api/instrumentation/, for up to INSTRUMENTATION_MAX_TAGS tags, and requests slower than
+    INSTRUMENTATION_SLOW_REQUEST_TIME are logged with the fingerprints of their queries. Queries are recorded like
+    with DEBUG = True, which is not needed, in a log of their own that is not limited to the last 9000 queries like
+    that of the connection. The serialization time includes both making the data of the REST API
+    responses (see api_rest.serializers) and rendering them.
+    Add it first in MIDDLEWARE_CLASSES, so that the wall time includes the other middleware.
+    """
+
+    def process_request(self, request):
+        request.instrumentation = RequestMetrics()
+        request.instrumentation_forced_debug_cursor = connection.force_debug_cursor
+        request.instrumentation_queries_log = connection.queries_log
+        connection.force_debug_cursor = True
+        connection.queries_log = deque()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'instrumentation', None)
+        if metrics is not None and metrics.tag is None:
+            metrics.tag = '{method} {view}'.format(method=request.method, view=request.resolver_match.view_name)
+
+    # The renderers of the REST API turn the data of the response into its body after this
+    def process_template_response(self, request, response):
+        if getattr(request, 'instrumentation', None) is not None:
+            started_at = time.perf_counter()
+
+            def rendered(response):
+                request.instrumentation.serialization_time += time.perf_counter() - started_at
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def process_response(self, request, response):
+        metrics = getattr(request, 'instrumentation', None)
+        if metrics is None:
+            return response
+        connection.force_debug_cursor = request.instrumentation_forced_debug_cursor
+        metrics.queries = list(connection.queries_log)
+        # The queries are still in the log of the connection afterwards, like with DEBUG = True
+        connection.queries_log = request.instrumentation_queries_log
+        connection.queries_log.extend(metrics.queries)
+        metrics.wall_time = time.perf_counter() - metrics.started_at
+        if metrics.tag is None:
+            metrics.tag = '{method} <unresolved>'.format(method=request.method)
+        recorder.record(metrics)
+
+        threshold = slow_request_time()
+        if threshold is not None and metrics.wall_time >= threshold:
+            logger.warning(
+                'Slow request %s %s (%s): %.3f s, %d queries in %.3f s, %.3f s serializing\n%s',
+                request.method, request.get_full_path(), metrics.tag, metrics.wall_time, metrics.sql_count,
+                metrics.sql_time, metrics.serialization_time,
+                '\n'.join('{count:5d} x {sql}'.format(count=count, sql=sql) for sql, count in metrics.fingerprints()))
+        return response
@@ -148,6 +148,85 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# Cache of serialized articles, article versions and categories. The default LRU cache lives in the memory of each
+# process; with several processes, use 'data_models.cache.DjangoCacheBackend' with a shared cache from CACHES
+# (options 'cache' and 'timeout') so that every process sees the invalidations.
+
+REPRESENTATION_CACHE = {
+    'BACKEND': 'data_models.cache.LRUCacheBackend',
+    'OPTIONS': {
+        'max_entries': 10000,
+    },
+}
+
+# Cache of diffs between pairs of article versions, and of word and line diffs, with the same backends. A
+# DjangoCacheBackend with a persistent cache keeps them across restarts. Rewriting a version clears the whole cache,
+# so give it a cache of its own.
+
+COMPARISON_CACHE = {
+    'BACKEND': 'data_models.cache.LRUCacheBackend',
+    'OPTIONS': {
+        'max_entries': 1000,
+    },
+}
+
+# Storage of article versions. With delta storage, each new version turns the previous one into a patch against it,
+# except every ARTICLE_VERSION_KEYFRAME_INTERVAL-th version, which is kept in full so that reading any version applies
+# fewer patches than the interval. Existing versions are converted with 'python manage.py compact_versions'.
+
+ARTICLE_VERSION_DELTA_STORAGE = False
+ARTICLE_VERSION_KEYFRAME_INTERVAL = 16
+
+# Contents (and patches) of at least ARTICLE_VERSION_COMPRESSION_THRESHOLD bytes are compressed with 'zlib', or with
+# 'zstd' if the zstandard package is installed. None stores everything uncompressed. Stored contents are read
+# regardless of the setting, and are compressed again by 'python manage.py compact_versions'.
+
+ARTICLE_VERSION_COMPRESSION = 'zlib'
+ARTICLE_VERSION_COMPRESSION_THRESHOLD = 512
+
+# Diffs between article versions are computed by a diff backend: ImmediateDiffBackend in the request,
+# ThreadPoolDiffBackend in threads of the web process after the version is saved, or QueueDiffBackend by
+# 'python manage.py compute_diffs --watch 1'. Until then the API shows the diff as pending (diff_status).
+# ARTICLE_VERSION_DIFF_TIMEOUT is the number of seconds spent on one diff before settling for a coarser one.
+
+ARTICLE_VERSION_DIFFS = {
+    'BACKEND': 'data_models.diffs.ThreadPoolDiffBackend',
+    'OPTIONS': {
+        'max_workers': 2,
+    },
+}
+ARTICLE_VERSION_DIFF_TIMEOUT = 1.0
+
+# GraphQL queries deeper than GRAPHQL_MAX_DEPTH fields, or estimated to resolve more than GRAPHQL_MAX_COST fields,
+# are rejected before they are executed (None for no limit). Lists without a 'first' argument are estimated to be
+# GRAPHQL_LIST_SIZE long.
+
+GRAPHQL_MAX_DEPTH = 10
+GRAPHQL_MAX_COST = 10000
+GRAPHQL_LIST_SIZE = 20
+
+# Queries registered as .graphql files in GRAPHQL_PERSISTED_QUERIES can be sent as '"id": "<SHA-256 of the file>"'
+# (see 'python manage.py persisted_queries'). Parsed and validated documents are kept in GRAPHQL_DOCUMENT_CACHE by the
+# hash of their query; use the LRU backend, as the documents are syntax trees.
+
+GRAPHQL_PERSISTED_QUERIES = os.path.join(BASE_DIR, 'api_graphql', 'persisted_queries')
+GRAPHQL_DOCUMENT_CACHE = {
+    'BACKEND': 'data_models.cache.LRUCacheBackend',
+    'OPTIONS': {
+        'max_entries': 500,
+    },
+}
+
+# Instrumentation of requests, enabled by adding 'revoltwiki.instrumentation.InstrumentationMiddleware' first in
+# MIDDLEWARE_CLASSES. Percentiles of the latest INSTRUMENTATION_SAMPLES requests to each endpoint are shown at
+# /api/instrumentation/, and requests taking at least INSTRUMENTATION_SLOW_REQUEST_TIME seconds are logged with
+# their queries (None logs nothing). Requests to more than INSTRUMENTATION_MAX_TAGS endpoints or GraphQL operations
+# are recorded together as '<other>'.
+
+INSTRUMENTATION_SAMPLES = 1000
+INSTRUMENTATION_SLOW_REQUEST_TIME = 1.0
+INSTRUMENTATION_MAX_TAGS = 100
+
 # JWT Settings
 
 JWT_AUTH = {